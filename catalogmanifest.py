@@ -0,0 +1,124 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import json
+import os
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from numpy import median
+
+from passtable import read_tle
+
+MANIFEST_SUFFIX = ".json"  # the manifest of a TLE file is <TLE file>.json
+FETCH_INTERVAL = 7200.  # s, minimal delay between two requests of the same catalog (Celestrak usage policy)
+FETCH_TIMEOUT = 30.  # s
+
+
+class CatalogManifest(object):
+    """ Freshness of a downloaded catalog, saved next to its TLE file
+
+    The ETag and Last-Modified headers of the last download are sent back in the next request, the server answers
+    304 Not Modified without the catalog if it has not changed.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path to the TLE file
+        """
+        self.path = path
+        self.url = None
+        self.etag = None
+        self.last_modified = None
+        self.fetched = 0.  # time of the last request answered by the server, s since the epoch
+        self.satellites = 0  # number of satellites of the catalog
+        self.source = None  # modification time and size of the TLE file described by the statistics
+        self.epoch_min = None  # UTC julian dates of the oldest, median and most recent elements
+        self.epoch_median = None
+        self.epoch_max = None
+
+    @classmethod
+    def load(cls, path):
+        """ Manifest of the TLE file 'path', empty if it has not been saved yet """
+        manifest = cls(path)
+        try:
+            with open(path + MANIFEST_SUFFIX) as f:
+                manifest.__dict__.update(json.load(f))
+        except (OSError, ValueError):
+            pass
+        manifest.path = path
+        return manifest
+
+    def save(self):
+        tmp = self.path + MANIFEST_SUFFIX + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({key: value for key, value in self.__dict__.items() if key != "path"}, f, indent=1)
+        os.replace(tmp, self.path + MANIFEST_SUFFIX)
+
+    def age(self):
+        """ Time since the last request in s """
+        return time.time() - self.fetched
+
+    def fetch(self, url, timeout=FETCH_TIMEOUT, conditional=True):
+        """
+        Download the catalog if it has changed since the last download
+        :param url: URL of the catalog
+        :param timeout: timeout of the request in s
+        :param conditional: send the ETag and the date of the last download, False to download the catalog in any case,
+            e.g. if the local file is invalid
+        :return: True if a new file was downloaded, False if the server answered that it has not changed. Raise
+        OSError if the download fails
+        """
+        request = Request(url)
+        if conditional and url == self.url and os.path.exists(self.path):
+            if self.etag is not None:
+                request.add_header("If-None-Match", self.etag)
+            if self.last_modified is not None:
+                request.add_header("If-Modified-Since", self.last_modified)
+        try:
+            with urlopen(request, timeout=timeout) as response:
+                data = response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except HTTPError as err:
+            if err.code != 304:
+                raise
+            self.fetched = time.time()
+            return False
+
+        # the previous file is replaced only once the download is complete and contains some TLE
+        tmp = self.path + ".download"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        if not read_tle(tmp):
+            os.remove(tmp)
+            raise OSError("no TLE in the catalog downloaded from " + url)
+        os.replace(tmp, self.path)
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched = time.time()
+        return True
+
+    def fresh(self, store):
+        """ True if the epoch statistics describe the ElementStore 'store' of the current TLE file """
+        return self.epoch_median is not None and self.satellites == len(store) and self.source == _source(self.path)
+
+    def update_statistics(self, store):
+        """ Update the epoch statistics from the ElementStore of the current TLE file """
+        self.source = _source(self.path)
+        self.satellites = len(store)
+        if len(store):
+            self.epoch_min = float(store.epoch.min())
+            self.epoch_median = float(median(store.epoch))
+            self.epoch_max = float(store.epoch.max())
+
+
+def _source(path):
+    """ Modification time and size of a file, as the marker of ElementStore.open(), None if it does not exist """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime, stat.st_size]
@@ -0,0 +1,111 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+from math import inf
+
+
+class PController(object):
+    """ Proportional controller of one axis with a feedforward of the target rate
+
+    update() returns the speed command of the axis from the position error and the motion of the target. The command
+    is clipped to the speed limit of the axis. All the values are in deg, deg/s and deg/s².
+    """
+
+    def __init__(self, p_gain, i_gain=0., d_gain=0., i_sat=inf):
+        """
+        :param p_gain: proportional gain in 1/s
+        :param i_gain: integral gain in 1/s², only used by the controllers with an integral term
+        :param d_gain: derivative gain (no unit), only used by the controllers with a derivative term
+        :param i_sat: limit of the integral term in deg/s (anti-windup)
+        """
+        self.p_gain = p_gain
+        self.i_gain = i_gain
+        self.d_gain = d_gain
+        self.i_sat = i_sat
+        self.t = None
+        self.dt = 0.
+        self.error = 0.
+        self.integral = 0.  # deg/s
+
+    def reset(self):
+        """ Forget the past errors, to be called when the tracking starts """
+        self.t = None
+        self.dt = 0.
+        self.error = 0.
+        self.integral = 0.
+
+    def update(self, error, rate, acceleration, t, bias=0., limit=inf):
+        """
+        Compute the speed command
+        :param error: position error (target - current) in deg
+        :param rate: speed of the target in deg/s
+        :param acceleration: acceleration of the target in deg/s²
+        :param t: time of the measurement in s
+        :param bias: speed added to the command (sidereal rate, manual offsets) in deg/s
+        :param limit: maximal absolute speed in deg/s
+        :return: speed command in deg/s
+        """
+        self.dt = t - self.t if self.t is not None else 0.
+        self.t = t
+        command = bias + self.feedforward(rate, acceleration) + self.feedback(error)
+        self.error = error
+
+        clipped = min(max(command, -limit), limit)
+        self.integrate(error, 1 if command > limit else -1 if command < -limit else 0)
+        return clipped
+
+    def feedforward(self, rate, acceleration):
+        return rate
+
+    def feedback(self, error):
+        return self.p_gain * error
+
+    def integrate(self, error, saturation):
+        """
+        Update the integral term
+        :param error: position error in deg
+        :param saturation: 1 if the command was clipped to +limit, -1 if it was clipped to -limit, 0 otherwise
+        """
+        pass
+
+
+class PIController(PController):
+    """ Proportional integral controller, removes the static error caused by the latency or the speed scale """
+
+    def feedback(self, error):
+        return self.p_gain * error + self.integral
+
+    def integrate(self, error, saturation):
+        # anti-windup: the integral is frozen while the error pushes the command further beyond the limit it is clipped
+        # to, it can still unwind, and it is limited to i_sat
+        if saturation * error > 0:
+            return
+        self.integral = min(max(self.integral + self.i_gain * error * self.dt, -self.i_sat), self.i_sat)
+
+
+class PIDController(PIController):
+    """ Proportional integral derivative controller, the derivative term damps the convergence after a goto """
+
+    def feedback(self, error):
+        derivative = (error - self.error) / self.dt if self.dt > 0 else 0.
+        return self.p_gain * error + self.integral + self.d_gain * derivative
+
+
+class FeedforwardController(PController):
+    """ Proportional controller with a feedforward of the target rate and acceleration
+
+    The command is kept until the next update, so the mean target rate over the next period is used instead of the
+    current rate. The period is assumed to be the same as the previous one.
+    """
+
+    def feedforward(self, rate, acceleration):
+        return rate + acceleration * self.dt / 2.
+
+
+CONTROLLERS = [PController, PIController, PIDController, FeedforwardController]
+CONTROLLER_NAMES = ["P", "PI", "PID", "Feedforward"]
+
+
+def make_controller(track_method, p_gain, i_gain=0., d_gain=0., i_sat=inf):
+    """ Controller selected by SatTrack.track_method: 0 = P, 1 = PI, 2 = PID, 3 = P with acceleration feedforward """
+    return CONTROLLERS[track_method](p_gain, i_gain, d_gain, i_sat)
@@ -0,0 +1,120 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import threading
+import time
+
+from numpy import sqrt
+
+from latency import extrapolate
+
+
+class ControlLoop(object):
+    """ Run SatTrack.update_tracking() at a fixed rate in a dedicated thread
+
+    The telescope coordinates received from INDI are only stored by mount_report(). Between two reports the position of
+    the telescope is extrapolated from the last reported coordinates and the last commanded speed, so the control rate
+    does not depend on the rate at which the driver publishes its coordinates.
+    """
+
+    def __init__(self, st, rate):
+        """
+        :param st: SatTrack object
+        :param rate: control rate in Hz
+        """
+        self.st = st
+        self.period = 1. / rate
+        self.report = None  # (t, ra, dec) of the last telescope report, t as TT julian date, ra in h, dec in deg
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+        # jitter statistics: delay between the scheduled and the actual start of the iterations
+        self.iterations = 0
+        self.overruns = 0  # iterations skipped because the previous one was too long
+        self.jitter_sum = 0.
+        self.jitter_sum2 = 0.
+        self.jitter_max = 0.
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="control loop", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the loop and wait for the end of the current iteration """
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def mount_report(self, ra, dec, t=None):
+        """
+        Store the coordinates reported by the telescope, the reports older than the one used for the extrapolation are
+        ignored
+        :param ra: ra in h
+        :param dec: dec in deg
+        :param t: TT julian date of the report, current time if omitted
+        """
+        if t is None:
+            t = self.st.t().tt
+        with self.lock:
+            if self.report is None or t >= self.report[0]:
+                self.report = (t, ra, dec)
+
+    def mount_position(self, t):
+        """
+        Telescope position extrapolated from the last report with the commanded speed
+        :param t: TT julian date
+        :return: ra in h, dec in deg, or None if the telescope has not reported its position yet
+        """
+        with self.lock:
+            report = self.report
+        if report is None:
+            return None
+        t_report, ra, dec = report
+        return extrapolate(ra, dec, self.st.speed_ra, self.st.speed_dec, (t - t_report) * 86400.)
+
+    def jitter(self):
+        """ Jitter statistics of the loop: mean, rms and max in s """
+        if self.iterations == 0:
+            return 0., 0., 0.
+        mean = self.jitter_sum / self.iterations
+        return mean, sqrt(self.jitter_sum2 / self.iterations), self.jitter_max
+
+    def iterate(self):
+        """ One iteration of the loop: control with the extrapolated telescope position """
+        position = self.mount_position(self.st.t().tt)
+        if position is not None:
+            self.st.update_tracking(*position)
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self.stop_event.is_set():
+            delay = next_time - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+
+            jitter = time.monotonic() - next_time
+            self.iterations += 1
+            self.jitter_sum += jitter
+            self.jitter_sum2 += jitter * jitter
+            self.jitter_max = max(self.jitter_max, jitter)
+
+            self.iterate()
+
+            # keep the schedule, skip the iterations that can no longer be done on time
+            next_time += self.period
+            late = time.monotonic() - next_time
+            if late > self.period:
+                skipped = int(late / self.period)
+                self.overruns += skipped
+                next_time += skipped * self.period
+
+        mean, rms, max_jitter = self.jitter()
+        self.st.log(2, "Control loop stopped after {0} iterations, jitter mean={1:.2f} ms rms={2:.2f} ms "
+                       "max={3:.2f} ms, {4} overruns", self.iterations, mean * 1e3, rms * 1e3, max_jitter * 1e3,
+                    self.overruns)
@@ -0,0 +1,333 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import os
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+from numpy import (arange, array, empty, int32, load as load_array, minimum, nonzero, save as save_array, searchsorted,
+                   setdiff1d)
+from sgp4.api import Satrec
+from skyfield.api import EarthSatellite
+
+from passtable import read_tle
+
+STORE_SUFFIX = ".store"  # the element store of a TLE file is the directory <TLE file>.store
+ELEMENTS = ("inclination", "raan", "eccentricity", "argp", "mean_anomaly", "mean_motion", "bstar", "ndot", "nddot")
+FIELDS = ("satnum", "epoch", "name", "line1", "line2") + ELEMENTS
+SATELLITE_CACHE = 64  # number of EarthSatellite objects kept by SatelliteCatalog
+
+
+class ElementStore(object):
+    """ Elements of a TLE file as a struct of arrays sorted by NORAD number
+
+    The arrays are saved as .npy files next to the TLE file and memory-mapped when the file has not changed, so the
+    startup does not parse the catalogs again. The raw lines are kept to build the EarthSatellite objects on demand.
+    """
+
+    def __init__(self, arrays):
+        """
+        :param arrays: dict of FIELDS: numpy array, one entry per satellite
+        """
+        self.satnum = arrays["satnum"]  # NORAD catalog number
+        self.epoch = arrays["epoch"]  # UTC julian date
+        self.name = arrays["name"]  # bytes, empty for 2-line files
+        self.line1 = arrays["line1"]  # bytes
+        self.line2 = arrays["line2"]
+        self.inclination = arrays["inclination"]  # rad
+        self.raan = arrays["raan"]  # rad
+        self.eccentricity = arrays["eccentricity"]
+        self.argp = arrays["argp"]  # rad
+        self.mean_anomaly = arrays["mean_anomaly"]  # rad
+        self.mean_motion = arrays["mean_motion"]  # rad/min (Kozai)
+        self.bstar = arrays["bstar"]  # 1/earth radii
+        self.ndot = arrays["ndot"]  # rad/min²
+        self.nddot = arrays["nddot"]  # rad/min³
+
+    @classmethod
+    def open(cls, path):
+        """
+        Element store of a TLE file, memory-mapped from the disk if it is up to date, else built and saved
+        :param path: path to the TLE file
+        :return: ElementStore, raise OSError if the TLE file cannot be read
+        """
+        source = os.stat(path)
+        source = array([source.st_mtime, source.st_size])
+        directory = path + STORE_SUFFIX
+        try:
+            if (load_array(os.path.join(directory, "source.npy")) == source).all():
+                return cls({field: load_array(os.path.join(directory, field + ".npy"), mmap_mode="r")
+                            for field in FIELDS})
+        except (OSError, ValueError):
+            pass  # missing or corrupted store
+
+        store = cls.parse(path)
+        try:
+            store.save(directory, source)
+        except OSError:
+            pass  # the store is used from the memory, e.g. the old files are still mapped on Windows
+        return store
+
+    @classmethod
+    def parse(cls, path):
+        """ Build the element store of a TLE file in memory """
+        tles = dict()
+        for name, line1, line2 in read_tle(path):
+            satrec = Satrec.twoline2rv(line1, line2)
+            tles[satrec.satnum] = (name, line1, line2, satrec)  # the last elements of a satellite are kept
+
+        satnums = sorted(tles)
+        n = len(satnums)
+        arrays = {"satnum": array(satnums, dtype=int32),
+                  "epoch": empty(n),
+                  "name": empty(n, dtype="S24"),
+                  "line1": empty(n, dtype="S69"),
+                  "line2": empty(n, dtype="S69")}
+        for field in ELEMENTS:
+            arrays[field] = empty(n)
+        for i, satnum in enumerate(satnums):
+            name, line1, line2, satrec = tles[satnum]
+            arrays["epoch"][i] = satrec.jdsatepoch + satrec.jdsatepochF
+            arrays["name"][i] = (name or "").encode("ascii")
+            arrays["line1"][i] = line1.encode("ascii")
+            arrays["line2"][i] = line2.encode("ascii")
+            arrays["inclination"][i] = satrec.inclo
+            arrays["raan"][i] = satrec.nodeo
+            arrays["eccentricity"][i] = satrec.ecco
+            arrays["argp"][i] = satrec.argpo
+            arrays["mean_anomaly"][i] = satrec.mo
+            arrays["mean_motion"][i] = satrec.no_kozai
+            arrays["bstar"][i] = satrec.bstar
+            arrays["ndot"][i] = satrec.ndot
+            arrays["nddot"][i] = satrec.nddot
+        return cls(arrays)
+
+    def save(self, directory, source):
+        """
+        Save the arrays in 'directory', source.npy (modification time and size of the TLE file) is written last and
+        marks the store as complete. The files are replaced, not overwritten, so the stores that are still mapped
+        remain valid.
+        """
+        os.makedirs(directory, exist_ok=True)
+        marker = os.path.join(directory, "source.npy")
+        if os.path.exists(marker):
+            os.remove(marker)
+        for field, value in [(field, getattr(self, field)) for field in FIELDS] + [("source", source)]:
+            path = os.path.join(directory, field + ".npy")
+            with open(path + ".tmp", "wb") as f:
+                save_array(f, value)
+            os.replace(path + ".tmp", path)
+
+    def __len__(self):
+        return len(self.satnum)
+
+    def find(self, satnum):
+        """ Index of a NORAD number in the store, None if it is not in the store """
+        i = searchsorted(self.satnum, satnum)
+        if i < len(self.satnum) and self.satnum[i] == satnum:
+            return int(i)
+        return None
+
+    def tle(self, i):
+        """ (name, line1, line2) of the i-th satellite, name is None for 2-line files """
+        name = self.name[i].decode("ascii")
+        return name or None, self.line1[i].decode("ascii"), self.line2[i].decode("ascii")
+
+    def satellite(self, i):
+        """ EarthSatellite of the i-th satellite """
+        name, line1, line2 = self.tle(i)
+        return EarthSatellite(line1, line2, name)
+
+
+class SatelliteRecord(object):
+    """ Entry of SatelliteCatalog: position of the most recent elements of a satellite in the element stores """
+    __slots__ = ("store", "i", "epoch", "catalogs")
+
+    def __init__(self, store, i, epoch):
+        self.store = store
+        self.i = i
+        self.epoch = epoch  # UTC julian date
+        self.catalogs = ()  # names of the catalogs containing the satellite
+
+    def tle(self):
+        return self.store.tle(self.i)
+
+    def satellite(self):
+        return self.store.satellite(self.i)
+
+
+class SatelliteCatalog(object):
+    """ Satellites of the loaded element stores indexed by name and by NORAD number, like the dictionaries returned by
+    load.tle()
+
+    Only one small record is kept per satellite, with the most recent elements found in the catalogs. The EarthSatellite
+    objects are built when they are accessed and the most recently used ones are kept in a LRU cache.
+    """
+
+    def __init__(self, cache_size=SATELLITE_CACHE):
+        """
+        :param cache_size: number of EarthSatellite objects kept in the cache
+        """
+        self.stores = dict()  # catalog name: ElementStore
+        self.records = dict()  # NORAD number: SatelliteRecord
+        self.names = dict()  # name: NORAD number
+        self.cache = OrderedDict()  # NORAD number: EarthSatellite, from the least to the most recently used
+        self.cache_size = cache_size
+        self.cache_lock = threading.Lock()
+
+    def __getstate__(self):
+        # sent to the processes of the tuning simulations without the cache and its lock
+        state = self.__dict__.copy()
+        state["cache"] = OrderedDict()
+        state["cache_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.cache_lock = threading.Lock()
+
+    def add(self, store, catalog):
+        """
+        Merge the element store of a catalog. The catalogs overlap, only the most recent elements of each NORAD number
+        are kept. When the catalog was already loaded, only the satellites whose lines have changed are merged again.
+        :param store: ElementStore
+        :param catalog: name of the catalog
+        :return: number of satellites whose elements were merged
+        """
+        previous = self.stores.get(catalog)
+        self.stores[catalog] = store
+        if previous is store:
+            return 0
+
+        changed = arange(len(store))
+        if previous is not None and len(previous):
+            j = minimum(searchsorted(previous.satnum, store.satnum), len(previous) - 1)
+            same = (previous.satnum[j] == store.satnum) & (previous.name[j] == store.name) & \
+                   (previous.line1[j] == store.line1) & (previous.line2[j] == store.line2)
+            # the unchanged satellites are moved to the new store
+            for i, satnum, j_previous in zip(nonzero(same)[0].tolist(), store.satnum[same].tolist(), j[same].tolist()):
+                record = self.records.get(satnum)
+                if record is not None and record.store is previous and record.i == j_previous:
+                    record.store, record.i = store, i
+            for satnum in setdiff1d(previous.satnum, store.satnum).tolist():
+                self._discard(satnum, catalog, previous)
+            changed = nonzero(~same)[0]
+
+        replaced = []
+        for i, satnum, name, epoch in zip(changed.tolist(), store.satnum[changed].tolist(),
+                                          store.name[changed].tolist(), store.epoch[changed].tolist()):
+            name = name.decode("ascii")
+            record = self.records.get(satnum)
+            if record is None:
+                record = self.records[satnum] = SatelliteRecord(store, i, epoch)
+                if name:
+                    self.names[name] = satnum
+            if catalog not in record.catalogs:
+                record.catalogs += (catalog,)
+            if record.store is not store and (epoch > record.epoch or record.store is previous):
+                # older elements than the ones replaced: another catalog may now have the most recent ones
+                self._move(satnum, record, *((store, i) if epoch > record.epoch else
+                                             self._freshest(satnum, record.catalogs)))
+                replaced.append(satnum)
+        with self.cache_lock:
+            for satnum in replaced:
+                self.cache.pop(satnum, None)
+        return len(changed)
+
+    def remove(self, catalog):
+        """ Remove the satellites of a catalog, except the ones that are also in other catalogs """
+        store = self.stores.pop(catalog, None)
+        if store is not None:
+            for satnum in store.satnum.tolist():
+                self._discard(satnum, catalog, store)
+
+    def _discard(self, satnum, catalog, store):
+        """ Remove a satellite from a catalog whose element store was 'store' """
+        record = self.records.get(satnum)
+        if record is None or catalog not in record.catalogs:
+            return
+        record.catalogs = tuple(c for c in record.catalogs if c != catalog)
+        if record.store is not store:
+            return
+
+        # elements of the satellite in the other catalogs
+        with self.cache_lock:
+            self.cache.pop(satnum, None)
+        best = self._freshest(satnum, record.catalogs)
+        if best is not None:
+            self._move(satnum, record, *best)
+        else:
+            del self.records[satnum]
+            name = store.name[record.i].decode("ascii")
+            if self.names.get(name) == satnum:
+                del self.names[name]
+
+    def _move(self, satnum, record, store, i):
+        """ Point the record of a satellite to the i-th elements of 'store', the names follow a renamed satellite """
+        previous_name = record.store.name[record.i].decode("ascii")
+        name = store.name[i].decode("ascii")
+        if previous_name != name and self.names.get(previous_name) == satnum:
+            del self.names[previous_name]
+        record.store, record.i = store, i
+        record.epoch = float(store.epoch[i])
+        if name:
+            self.names[name] = satnum
+
+    def _freshest(self, satnum, catalogs):
+        """ (ElementStore, index) of the most recent elements of a satellite in some catalogs, None if it is in none """
+        best = None
+        for catalog in catalogs:
+            store = self.stores[catalog]
+            i = store.find(satnum)
+            if i is not None and (best is None or store.epoch[i] > best[0].epoch[best[1]]):
+                best = (store, i)
+        return best
+
+    def record(self, key):
+        """ SatelliteRecord of a name or a NORAD number, raise KeyError if it is not in the catalog """
+        return self.records[self.names.get(key, key)]
+
+    def satellite_keys(self):
+        """
+        One key per satellite: its name, or its NORAD number if it has no name or if its name is used by another
+        satellite
+        """
+        return [key for key, satnum, record in self.satellite_entries()]
+
+    def satellite_entries(self):
+        """ (key, NORAD number, SatelliteRecord) of each satellite, the key is the one returned by satellite_keys() """
+        entries = []
+        for satnum, record in self.records.items():
+            name = record.store.name[record.i].decode("ascii")
+            entries.append((name if name and self.names.get(name) == satnum else satnum, satnum, record))
+        return entries
+
+    def tles(self):
+        """ (name, line1, line2) of the satellites, one entry per NORAD number """
+        return [record.tle() for record in self.records.values()]
+
+    def __getitem__(self, key):
+        satnum = self.names.get(key, key)
+        record = self.records[satnum]
+        with self.cache_lock:
+            try:
+                self.cache.move_to_end(satnum)
+                return self.cache[satnum]
+            except KeyError:
+                pass
+        satellite = record.satellite()
+        with self.cache_lock:
+            self.cache[satnum] = satellite
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return satellite
+
+    def __contains__(self, key):
+        return key in self.names or key in self.records
+
+    def __iter__(self):
+        return chain(self.records, self.names)
+
+    def __len__(self):
+        return len(self.records) + len(self.names)
@@ -7,6 +7,8 @@ import time
 import PyIndi
 from skyfield.units import Angle
 
+from latency import LatencyEstimator
+
 
 class IndiClient(PyIndi.BaseClient):
     def __init__(self, st):
@@ -37,6 +39,7 @@ class IndiClient(PyIndi.BaseClient):
         self.waiting_goto_end = False
         self.max_allowed_speed_ra = 0.0
         self.max_allowed_speed_de = 0.0
+        self.latency = LatencyEstimator()
 
     def newDevice(self, d):
         self.st.log(2, "New device: " + d.getDeviceName())
@@ -76,9 +79,11 @@ class IndiClient(PyIndi.BaseClient):
 
     def newNumber(self, nvp):
         if nvp.device == self.telescope_name and nvp.name == "EQUATORIAL_EOD_COORD":
-            self.st.update_tracking(nvp[0].value, nvp[1].value)
+            self.st.update_telescope_coord(nvp[0].value, nvp[1].value)
             if self.waiting_goto_end and nvp.s==PyIndi.IPS_OK:
                 self.waiting_goto_end = False
+        if nvp.device == self.telescope_name and nvp.name == "TELESCOPE_TRACK_RATE" and nvp.s != PyIndi.IPS_BUSY:
+            self.latency.ack_received(nvp[0].value, nvp[1].value)
         if nvp.device == "Joystick" and nvp.name == "JOYSTICK_AXES":
             self.st.update_joystick_offset(nvp)
 
@@ -102,6 +107,7 @@ class IndiClient(PyIndi.BaseClient):
         """Configure the device as telescope (try to connect & check properties). Return True if successful"""
         self.telescope_name = device_name
         self.telescope = None
+        self.latency.reset()
         self.telescope_prop = {
             "CONNECTION": None,
             "EQUATORIAL_EOD_COORD": None,
@@ -227,6 +233,7 @@ class IndiClient(PyIndi.BaseClient):
         rate_prop[0].value = ra_speed
         rate_prop[1].value = dec_speed
         self.sendNewNumber(rate_prop)
+        self.latency.command_sent(ra_speed, dec_speed)
 
     def goto(self, ra: Angle, dec: Angle):
         """ goto to given coordinates"""
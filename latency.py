@@ -0,0 +1,94 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import threading
+import time
+from collections import deque
+
+from numpy import median
+
+LATENCY_WINDOW = 21  # number of round trips in the rolling median
+LATENCY_TIMEOUT = 5.  # s, commands that are not acknowledged within this delay are forgotten
+LATENCY_TOLERANCE = 0.01  # arcsec/s, an acknowledgement matches a command if their rates differ by less than this
+SIDEREAL_RATE = 360. / 86164.  # deg/s
+
+
+def extrapolate(ra, dec, speed_ra, speed_dec, dt):
+    """
+    Position of the telescope moving at the commanded speed
+    :param ra: ra in h
+    :param dec: dec in deg
+    :param speed_ra: commanded RA speed in deg/s, relative to the sidereal rate and in the opposite direction of the RA
+    :param speed_dec: commanded DEC speed in deg/s
+    :param dt: duration of the extrapolation in s
+    :return: ra in h, dec in deg
+    """
+    return (ra + dt * (SIDEREAL_RATE - speed_ra) / 15.) % 24., dec + dt * speed_dec
+
+
+def compensate(ra, dec, speed_ra, speed_dec, delay):
+    """
+    Latency compensation: the coordinates received are late by half the round trip delay and the command will be
+    applied after the other half, the telescope position is extrapolated with the current speed command to the time
+    the command will be applied. The target must be taken at the same time, half a round trip after the current time.
+    :param ra: reported ra in h
+    :param dec: reported dec in deg
+    :param speed_ra: current RA speed command in deg/s, see extrapolate()
+    :param speed_dec: current DEC speed command in deg/s
+    :param delay: round trip delay in s
+    :return: ra in h, dec in deg at the time the command will be applied, lead of the target in s
+    """
+    ra, dec = extrapolate(ra, dec, speed_ra, speed_dec, delay)
+    return ra, dec, delay / 2.
+
+
+class LatencyEstimator(object):
+    """ Rolling estimation of the round trip delay between a speed command and its acknowledgement by the driver
+
+    command_sent() is called when TELESCOPE_TRACK_RATE is sent and ack_received() when the driver publishes the new
+    value. An acknowledgement is paired with the oldest pending command of the same rates, the older commands are
+    considered lost and the acknowledgements that do not echo any pending command (unsolicited updates) are ignored.
+    The median is used to be robust to the delays caused by the other INDI traffic.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW, clock=time.monotonic, tolerance=LATENCY_TOLERANCE):
+        """
+        :param window: number of round trips in the rolling median
+        :param clock: function returning the current time in s
+        :param tolerance: maximal difference between the rates of a command and of its acknowledgement
+        """
+        self.clock = clock
+        self.tolerance = tolerance
+        self.pending = deque()  # (send time, ra rate, dec rate) of the commands waiting for an acknowledgement
+        self.delays = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def command_sent(self, ra_rate, dec_rate):
+        """ Called when a command is sent, with the rates as sent to the driver """
+        with self.lock:
+            now = self.clock()
+            while self.pending and now - self.pending[0][0] > LATENCY_TIMEOUT:
+                self.pending.popleft()
+            self.pending.append((now, ra_rate, dec_rate))
+
+    def ack_received(self, ra_rate, dec_rate):
+        """ Called when the driver publishes the rates """
+        with self.lock:
+            for i, (t, command_ra, command_dec) in enumerate(self.pending):
+                if abs(command_ra - ra_rate) <= self.tolerance and abs(command_dec - dec_rate) <= self.tolerance:
+                    self.delays.append(self.clock() - t)
+                    for _ in range(i + 1):
+                        self.pending.popleft()
+                    return
+
+    def latency(self):
+        """ Estimated round trip delay in s, 0 before the first measurement """
+        with self.lock:
+            if not self.delays:
+                return 0.
+            return float(median(self.delays))
+
+    def reset(self):
+        with self.lock:
+            self.pending.clear()
+            self.delays.clear()
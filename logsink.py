@@ -0,0 +1,173 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import os
+import threading
+import time
+from collections import deque
+
+LOG_CAPACITY = 1000  # number of messages waiting for the flush and shown by the UI
+LOG_FLUSH_PERIOD = 0.25  # s, period of the flush of the messages to the UI and to the file
+LOG_FILE = "orbithunter.log"
+LOG_FILE_SIZE = 1000000  # bytes, the file is rotated when it exceeds this size
+LOG_FILE_COUNT = 3  # number of rotated files kept: orbithunter.log.1 to orbithunter.log.3
+LEVEL_NAMES = ("ERROR", "WARNING", "Info", "Debug")
+LEVEL_COLORS = ("Red", "Orange", "Black", "Blue")
+
+
+def format_record(record):
+    """
+    Text of a log record
+    :param record: (level, date, text, args) with the date as a POSIX timestamp, the text is formatted with the
+        arguments by str.format() if there are any
+    :return: "2020-01-01T00:00:00Z - Info: text"
+    """
+    level, date, text, args = record
+    return "{0} - {1}: {2}".format(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(date)),
+                                   LEVEL_NAMES[min(level, 3)], text.format(*args) if args else text)
+
+
+def format_html(record):
+    """ HTML line of a log record for the log browser of the UI """
+    return "<font color=\"{0}\">{1}</font>".format(LEVEL_COLORS[min(record[0], 3)], format_record(record))
+
+
+class RotatingFile(object):
+    """ Text file renamed to file.1, file.2... when it exceeds a maximal size """
+
+    def __init__(self, path, max_size=LOG_FILE_SIZE, count=LOG_FILE_COUNT):
+        """
+        :param path: path of the file, it is opened on the first write
+        :param max_size: maximal size in bytes
+        :param count: number of rotated files kept
+        """
+        self.path = path
+        self.max_size = max_size
+        self.count = count
+        self.file = None
+
+    def write(self, lines):
+        """ Append lines to the file, rotate it if it is full """
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write("".join(line + "\n" for line in lines))
+        self.file.flush()
+        if self.file.tell() > self.max_size:
+            self.rotate()
+
+    def rotate(self):
+        self.close()
+        for i in range(self.count - 1, 0, -1):
+            if os.path.exists("{0}.{1}".format(self.path, i)):
+                os.replace("{0}.{1}".format(self.path, i), "{0}.{1}".format(self.path, i + 1))
+        if self.count > 0:
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class LogSink(object):
+    """ Bounded log of SatTrack, messages can be logged from any thread
+
+    log() only stores the level, the date, the text and the arguments of the message in a ring buffer: they are
+    formatted when the pending messages are flushed, by the UI at a fixed period. The oldest messages are dropped if
+    they are not flushed in time. The messages of a level that is neither printed, written nor shown are discarded
+    immediately.
+
+    The threads that log, e.g. the TLE update threads and the control loop, never touch the UI: only the thread that
+    flushes does, the GUI thread when there is a UI. Without UI the flushes of the different threads are serialized.
+    """
+
+    def __init__(self, path=None, capacity=LOG_CAPACITY):
+        """
+        :param path: path of the log file, no file if omitted
+        :param capacity: maximal number of messages waiting for the flush
+        """
+        self.pending = deque(maxlen=capacity)  # (level, date, text, args), messages not flushed yet
+        self.dropped = 0  # number of pending messages dropped since the last flush
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()  # the console and the file are written by a single thread at a time
+        self.file = RotatingFile(path) if path else None
+        self.file_level = 2  # maximal level of the messages written in the file, 3 to include the debug messages
+        self.console_level = 2  # maximal level of the messages printed
+        self.ui_level = 2  # maximal level of the messages shown by the UI
+
+    def __getstate__(self):
+        # sent to the processes of the tuning simulations without the pending messages, the file and the lock
+        state = self.__dict__.copy()
+        state["pending"] = deque(maxlen=self.pending.maxlen)
+        state["dropped"] = 0
+        state["file"] = None
+        state["lock"] = None
+        state["flush_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+
+    def open(self, path):
+        """ Write the messages flushed from now on to the file 'path', the pending messages included """
+        with self.flush_lock:
+            if self.file is not None:
+                self.file.close()
+            self.file = RotatingFile(path)
+
+    def enabled(self, level):
+        """ True if the messages of this level are printed, written in the file or shown by the UI """
+        return level <= self.console_level or level <= self.ui_level or (self.file is not None and
+                                                                         level <= self.file_level)
+
+    def log(self, level, text, args=(), date=None):
+        """
+        Add a message, nothing is done if its level is not enabled
+        :param level: 0 for error, 1 for warning, 2 for common messages, 3 for extended logging
+        :param text: message, or format string of str.format() if there are arguments
+        :param args: tuple of arguments of the format string, formatted at the flush
+        :param date: POSIX timestamp of the message, current time if omitted
+        """
+        if not self.enabled(level):
+            return
+        record = (level, time.time() if date is None else date, text, args)
+        with self.lock:
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append(record)
+
+    def flush(self):
+        """
+        Write the pending messages to the console and the file
+        :return: list of the pending messages (level, date, text, args), preceded by a warning if some were dropped
+        """
+        with self.flush_lock:
+            with self.lock:
+                records = list(self.pending)
+                self.pending.clear()
+                dropped, self.dropped = self.dropped, 0
+            if dropped:
+                records.insert(0, (1, records[0][1], "{0} log messages dropped", (dropped,)))
+
+            lines = [format_record(record) for record in records if record[0] <= self.console_level]
+            if lines:
+                print("\n".join(lines))
+            if self.file is not None:
+                lines = [format_record(record) for record in records if record[0] <= self.file_level]
+                if lines:
+                    try:
+                        self.file.write(lines)
+                    except OSError as err:
+                        print("Log file disabled: " + str(err))
+                        self.file = None
+        return records
+
+    def close(self):
+        """ Flush the pending messages and close the file """
+        self.flush()
+        if self.file is not None:
+            self.file.close()
@@ -184,6 +184,39 @@ class Ui_MainWindow(object):
         self.max_speed_RA_spinbox.setSingleStep(0.1)
         self.max_speed_RA_spinbox.setObjectName("max_speed_RA_spinbox")
         self.tracking_layout.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.max_speed_RA_spinbox)
+        self.control_rate_lbl = QtWidgets.QLabel(self.tracking_box)
+        self.control_rate_lbl.setObjectName("control_rate_lbl")
+        self.tracking_layout.setWidget(5, QtWidgets.QFormLayout.LabelRole, self.control_rate_lbl)
+        self.control_rate_spinbox = QtWidgets.QDoubleSpinBox(self.tracking_box)
+        self.control_rate_spinbox.setMaximum(50.0)
+        self.control_rate_spinbox.setObjectName("control_rate_spinbox")
+        self.tracking_layout.setWidget(5, QtWidgets.QFormLayout.FieldRole, self.control_rate_spinbox)
+        self.controller_lbl = QtWidgets.QLabel(self.tracking_box)
+        self.controller_lbl.setObjectName("controller_lbl")
+        self.tracking_layout.setWidget(6, QtWidgets.QFormLayout.LabelRole, self.controller_lbl)
+        self.controller_combobox = QtWidgets.QComboBox(self.tracking_box)
+        self.controller_combobox.setObjectName("controller_combobox")
+        self.controller_combobox.addItem("")
+        self.controller_combobox.addItem("")
+        self.controller_combobox.addItem("")
+        self.controller_combobox.addItem("")
+        self.tracking_layout.setWidget(6, QtWidgets.QFormLayout.FieldRole, self.controller_combobox)
+        self.i_gain_lbl = QtWidgets.QLabel(self.tracking_box)
+        self.i_gain_lbl.setObjectName("i_gain_lbl")
+        self.tracking_layout.setWidget(7, QtWidgets.QFormLayout.LabelRole, self.i_gain_lbl)
+        self.i_gain_spinbox = QtWidgets.QDoubleSpinBox(self.tracking_box)
+        self.i_gain_spinbox.setDecimals(3)
+        self.i_gain_spinbox.setSingleStep(0.01)
+        self.i_gain_spinbox.setObjectName("i_gain_spinbox")
+        self.tracking_layout.setWidget(7, QtWidgets.QFormLayout.FieldRole, self.i_gain_spinbox)
+        self.d_gain_lbl = QtWidgets.QLabel(self.tracking_box)
+        self.d_gain_lbl.setObjectName("d_gain_lbl")
+        self.tracking_layout.setWidget(8, QtWidgets.QFormLayout.LabelRole, self.d_gain_lbl)
+        self.d_gain_spinbox = QtWidgets.QDoubleSpinBox(self.tracking_box)
+        self.d_gain_spinbox.setDecimals(3)
+        self.d_gain_spinbox.setSingleStep(0.01)
+        self.d_gain_spinbox.setObjectName("d_gain_spinbox")
+        self.tracking_layout.setWidget(8, QtWidgets.QFormLayout.FieldRole, self.d_gain_spinbox)
         self.verticalLayout_5.addLayout(self.tracking_layout)
         self.tracking_control_layout.addWidget(self.tracking_box)
         self.control_box = QtWidgets.QGroupBox(self.central_widget)
@@ -342,16 +375,30 @@ class Ui_MainWindow(object):
         self.catalog_config_btn.setObjectName("catalog_config_btn")
         self.horizontalLayout.addWidget(self.catalog_config_btn)
         self.verticalLayout_4.addLayout(self.horizontalLayout)
+        self.horizontalLayout_10 = QtWidgets.QHBoxLayout()
+        self.horizontalLayout_10.setSpacing(6)
+        self.horizontalLayout_10.setObjectName("horizontalLayout_10")
+        self.sat_search_edit = QtWidgets.QLineEdit(self.satellite_box)
+        self.sat_search_edit.setClearButtonEnabled(True)
+        self.sat_search_edit.setObjectName("sat_search_edit")
+        self.horizontalLayout_10.addWidget(self.sat_search_edit)
+        self.sat_catalog_combobox = QtWidgets.QComboBox(self.satellite_box)
+        self.sat_catalog_combobox.setObjectName("sat_catalog_combobox")
+        self.sat_catalog_combobox.addItem("")
+        self.horizontalLayout_10.addWidget(self.sat_catalog_combobox)
+        self.sat_orbit_combobox = QtWidgets.QComboBox(self.satellite_box)
+        self.sat_orbit_combobox.setObjectName("sat_orbit_combobox")
+        self.sat_orbit_combobox.addItem("")
+        self.sat_orbit_combobox.addItem("")
+        self.sat_orbit_combobox.addItem("")
+        self.sat_orbit_combobox.addItem("")
+        self.sat_orbit_combobox.addItem("")
+        self.horizontalLayout_10.addWidget(self.sat_orbit_combobox)
+        self.verticalLayout_4.addLayout(self.horizontalLayout_10)
         self.sat_combobox = QtWidgets.QComboBox(self.satellite_box)
         self.sat_combobox.setEnabled(True)
-        self.sat_combobox.setEditable(True)
-        self.sat_combobox.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+        self.sat_combobox.setMaxVisibleItems(20)
         self.sat_combobox.setObjectName("sat_combobox")
-        self.sat_combobox.addItem("")
-        self.sat_combobox.addItem("")
-        self.sat_combobox.addItem("")
-        self.sat_combobox.addItem("")
-        self.sat_combobox.addItem("")
         self.verticalLayout_4.addWidget(self.sat_combobox)
         self.horizontalLayout_9 = QtWidgets.QHBoxLayout()
         self.horizontalLayout_9.setSpacing(6)
@@ -501,6 +548,30 @@ class Ui_MainWindow(object):
         self.pass_grid.addWidget(self.label_15, 11, 0, 1, 1)
         spacerItem9 = QtWidgets.QSpacerItem(20, 5, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Fixed)
         self.pass_grid.addItem(spacerItem9, 3, 0, 1, 2)
+        spacerItem10 = QtWidgets.QSpacerItem(20, 5, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Fixed)
+        self.pass_grid.addItem(spacerItem10, 15, 0, 1, 2)
+        self.label_33 = QtWidgets.QLabel(self.pass_box)
+        font = QtGui.QFont()
+        font.setUnderline(True)
+        self.label_33.setFont(font)
+        self.label_33.setObjectName("label_33")
+        self.pass_grid.addWidget(self.label_33, 16, 0, 1, 1)
+        self.label_34 = QtWidgets.QLabel(self.pass_box)
+        self.label_34.setIndent(20)
+        self.label_34.setObjectName("label_34")
+        self.pass_grid.addWidget(self.label_34, 17, 0, 1, 1)
+        self.shadow_entry_lbl = QtWidgets.QLabel(self.pass_box)
+        self.shadow_entry_lbl.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.shadow_entry_lbl.setObjectName("shadow_entry_lbl")
+        self.pass_grid.addWidget(self.shadow_entry_lbl, 17, 1, 1, 1)
+        self.label_35 = QtWidgets.QLabel(self.pass_box)
+        self.label_35.setIndent(20)
+        self.label_35.setObjectName("label_35")
+        self.pass_grid.addWidget(self.label_35, 18, 0, 1, 1)
+        self.shadow_exit_lbl = QtWidgets.QLabel(self.pass_box)
+        self.shadow_exit_lbl.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.shadow_exit_lbl.setObjectName("shadow_exit_lbl")
+        self.pass_grid.addWidget(self.shadow_exit_lbl, 18, 1, 1, 1)
         self.verticalLayout_6.addLayout(self.pass_grid)
         self.horizontalLayout_7 = QtWidgets.QHBoxLayout()
         self.horizontalLayout_7.setContentsMargins(20, 0, 20, 0)
@@ -512,9 +583,12 @@ class Ui_MainWindow(object):
         self.next_pass_btn = QtWidgets.QPushButton(self.pass_box)
         self.next_pass_btn.setObjectName("next_pass_btn")
         self.horizontalLayout_7.addWidget(self.next_pass_btn)
+        self.pass_table_btn = QtWidgets.QPushButton(self.pass_box)
+        self.pass_table_btn.setObjectName("pass_table_btn")
+        self.horizontalLayout_7.addWidget(self.pass_table_btn)
         self.verticalLayout_6.addLayout(self.horizontalLayout_7)
-        spacerItem10 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
-        self.verticalLayout_6.addItem(spacerItem10)
+        spacerItem11 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.verticalLayout_6.addItem(spacerItem11)
         self.satellite_layout.addWidget(self.pass_box)
         self.main_layout.addLayout(self.satellite_layout)
         self.status_layout = QtWidgets.QVBoxLayout()
@@ -535,6 +609,13 @@ class Ui_MainWindow(object):
         self.time_lbl = QtWidgets.QLabel(self.status_box)
         self.time_lbl.setObjectName("time_lbl")
         self.horizontalLayout_3.addWidget(self.time_lbl)
+        self.display_rate_spinbox = QtWidgets.QDoubleSpinBox(self.status_box)
+        self.display_rate_spinbox.setDecimals(1)
+        self.display_rate_spinbox.setMinimum(0.2)
+        self.display_rate_spinbox.setMaximum(20.0)
+        self.display_rate_spinbox.setProperty("value", 1.0)
+        self.display_rate_spinbox.setObjectName("display_rate_spinbox")
+        self.horizontalLayout_3.addWidget(self.display_rate_spinbox)
         self.verticalLayout_9.addLayout(self.horizontalLayout_3)
         self.label_7 = QtWidgets.QLabel(self.status_box)
         self.label_7.setObjectName("label_7")
@@ -665,8 +746,8 @@ class Ui_MainWindow(object):
         self.gridLayout_6.addWidget(self.offset_dec_lbl, 1, 1, 1, 1)
         self.verticalLayout_9.addLayout(self.gridLayout_6)
         self.status_layout.addWidget(self.status_box)
-        spacerItem11 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
-        self.status_layout.addItem(spacerItem11)
+        spacerItem12 = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
+        self.status_layout.addItem(spacerItem12)
         self.main_layout.addLayout(self.status_layout)
         self.verticalLayout_7.addLayout(self.main_layout)
         self.log_layout = QtWidgets.QGroupBox(self.central_widget)
@@ -681,6 +762,9 @@ class Ui_MainWindow(object):
         self.verticalLayout_11.addWidget(self.log_browser)
         self.verticalLayout_7.addWidget(self.log_layout)
         MainWindow.setCentralWidget(self.central_widget)
+        self.statusbar = QtWidgets.QStatusBar(MainWindow)
+        self.statusbar.setObjectName("statusbar")
+        MainWindow.setStatusBar(self.statusbar)
 
         self.retranslateUi(MainWindow)
         QtCore.QMetaObject.connectSlotsByName(MainWindow)
@@ -715,6 +799,16 @@ class Ui_MainWindow(object):
         self.joystick_btn.setText(_translate("MainWindow", "No joystick detected"))
         self.max_speed_RA_lbl.setText(_translate("MainWindow", "Max speed RA"))
         self.max_speed_RA_spinbox.setSuffix(_translate("MainWindow", " deg/s"))
+        self.control_rate_lbl.setText(_translate("MainWindow", "Control rate:"))
+        self.control_rate_spinbox.setToolTip(_translate("MainWindow", "0 to update the control each time the telescope coordinates are received"))
+        self.control_rate_spinbox.setSuffix(_translate("MainWindow", " Hz"))
+        self.controller_lbl.setText(_translate("MainWindow", "Controller:"))
+        self.controller_combobox.setItemText(0, _translate("MainWindow", "P"))
+        self.controller_combobox.setItemText(1, _translate("MainWindow", "PI"))
+        self.controller_combobox.setItemText(2, _translate("MainWindow", "PID"))
+        self.controller_combobox.setItemText(3, _translate("MainWindow", "P + acceleration feedforward"))
+        self.i_gain_lbl.setText(_translate("MainWindow", "I gain:"))
+        self.d_gain_lbl.setText(_translate("MainWindow", "D gain:"))
         self.control_box.setTitle(_translate("MainWindow", "Control:"))
         self.down_btn.setText(_translate("MainWindow", "⬇"))
         self.center_btn.setText(_translate("MainWindow", "Track"))
@@ -731,11 +825,13 @@ class Ui_MainWindow(object):
         self.satellite_box.setTitle(_translate("MainWindow", "Satellite"))
         self.catalog_sat_btn.setText(_translate("MainWindow", "Fro&m catalog"))
         self.catalog_config_btn.setText(_translate("MainWindow", "Config"))
-        self.sat_combobox.setItemText(0, _translate("MainWindow", "ISS"))
-        self.sat_combobox.setItemText(1, _translate("MainWindow", "Hubble"))
-        self.sat_combobox.setItemText(2, _translate("MainWindow", "IRIDIUM 10"))
-        self.sat_combobox.setItemText(3, _translate("MainWindow", "IRIDIUM 11"))
-        self.sat_combobox.setItemText(4, _translate("MainWindow", "O3B"))
+        self.sat_search_edit.setPlaceholderText(_translate("MainWindow", "Name or NORAD number"))
+        self.sat_catalog_combobox.setItemText(0, _translate("MainWindow", "All catalogs"))
+        self.sat_orbit_combobox.setItemText(0, _translate("MainWindow", "All orbits"))
+        self.sat_orbit_combobox.setItemText(1, _translate("MainWindow", "LEO"))
+        self.sat_orbit_combobox.setItemText(2, _translate("MainWindow", "MEO"))
+        self.sat_orbit_combobox.setItemText(3, _translate("MainWindow", "GEO"))
+        self.sat_orbit_combobox.setItemText(4, _translate("MainWindow", "HEO"))
         self.tle_sat_btn.setText(_translate("MainWindow", "From &TLE"))
         self.set_TLE_btn.setText(_translate("MainWindow", "Set TLE"))
         self.sat_lbl.setText(_translate("MainWindow", "Valid elements, 3.1day old"))
@@ -762,11 +858,19 @@ class Ui_MainWindow(object):
         self.label_4.setText(_translate("MainWindow", "Set:"))
         self.culmination_az_lbl.setText(_translate("MainWindow", "12°12\'13\""))
         self.label_15.setText(_translate("MainWindow", "Az:"))
+        self.label_33.setText(_translate("MainWindow", "Shadow:"))
+        self.label_34.setText(_translate("MainWindow", "Entry:"))
+        self.shadow_entry_lbl.setText(_translate("MainWindow", "2019-02-22 23:00:00"))
+        self.label_35.setText(_translate("MainWindow", "Exit:"))
+        self.shadow_exit_lbl.setText(_translate("MainWindow", "2019-02-22 23:00:00"))
         self.prev_pass_btn.setText(_translate("MainWindow", "Previous"))
         self.next_pass_btn.setText(_translate("MainWindow", "Next"))
+        self.pass_table_btn.setText(_translate("MainWindow", "All satellites"))
         self.status_box.setTitle(_translate("MainWindow", "Status"))
         self.label_5.setText(_translate("MainWindow", "Time:"))
         self.time_lbl.setText(_translate("MainWindow", "2019-02-22 23:00:00"))
+        self.display_rate_spinbox.setToolTip(_translate("MainWindow", "Update rate of the status"))
+        self.display_rate_spinbox.setSuffix(_translate("MainWindow", " Hz"))
         self.label_7.setText(_translate("MainWindow", "Satellite position:"))
         self.sat_az_lbl.setText(_translate("MainWindow", "12°12\'13\""))
         self.label_10.setText(_translate("MainWindow", "Alt:"))
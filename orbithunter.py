@@ -3,22 +3,30 @@ pySatTrack allows you to track satellites with any INDI telescope
 
 Author: Romain Fafet (farom57@gmail.com)
 """
-
-from sattrack import *
-from ui import *
+import os
 import sys
 
-# TODO: load existing configuration if any
-st = SatTrack()
-app = QtWidgets.QApplication(sys.argv)  # A new instance of QApplication
-ui = UI(st)
-ui.show()
-app.exec_()
-# TODO: st.save()
-app.quit()
-
-
-
-
-
-
+from PyQt5 import QtGui, QtWidgets
+
+# the worker processes of the pass predictions and of the tuning are spawned: they import this script without
+# running it
+if __name__ == "__main__":
+    # a splash screen is shown during the import of numpy and Skyfield, the timescale, the catalogs and the ephemeris
+    # are then loaded by the UI in background
+    app = QtWidgets.QApplication(sys.argv)  # A new instance of QApplication
+    splash = QtWidgets.QSplashScreen(QtGui.QPixmap(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                "icon.png")))
+    splash.show()
+    app.processEvents()
+
+    from sattrack import SatTrack
+    from ui import UI
+
+    # TODO: load existing configuration if any
+    st = SatTrack(wait=False)
+    ui = UI(st)
+    ui.show()
+    splash.finish(ui)
+    app.exec_()
+    # TODO: st.save()
+    app.quit()
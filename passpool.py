@@ -0,0 +1,135 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from os import cpu_count
+
+from numpy import radians
+from skyfield.api import EarthSatellite
+
+from passsearch import FINE_STEP, SEARCH_WINDOW, altaz, find_eclipse, find_pass, pass_tuple, pass_visible
+from rotation import RotationCache
+from shadow import illumination, sun_altitude, sun_itrf
+
+POOL_CHUNK = 20  # satellites per task, small enough to report the progress regularly
+
+# state of the worker processes, set by _init_worker()
+_ts = None
+_obs = None
+_sun_table = None
+_rotation = None
+
+
+def _init_worker(ts, obs, sun_table):
+    global _ts, _obs, _sun_table, _rotation
+    _ts = ts
+    _obs = obs
+    _sun_table = sun_table
+    _rotation = RotationCache(ts)
+
+
+def _following_pass(alt_az, found, backward):
+    """ Pass after the pass 'found' returned by find_pass(), or before it if backward, with the time offsets from the
+    same origin. None if there is no other pass ending in the search window, where the Sun table is filled. """
+    start = found[0][0 if backward else 3]
+    if start is None or abs(start) >= SEARCH_WINDOW:
+        return None
+    found = find_pass(lambda dt: alt_az(start + dt), backward)
+    if found is None:
+        return None
+    dt_events = tuple(None if dt is None else start + dt for dt in found[0])
+    end = dt_events[0 if backward else 3]
+    if end is None or abs(end) > SEARCH_WINDOW + FINE_STEP:
+        return None
+    return (dt_events,) + found[1:]
+
+
+def _chunk_passes(tles, t0, backward, sun_max_alt=None):
+    """ Search the next pass of a chunk of satellites in a worker process, same computation as SatTrack.next_pass().
+    If sun_max_alt is given (in deg), the passes during which the satellite cannot be seen are skipped: the next
+    visible pass of the search window is returned, as by batch_passes(). """
+    results = []
+    for name, line1, line2 in tles:
+        sat = EarthSatellite(line1, line2, name)
+
+        def alt_az(dt):
+            return altaz(sat, _obs, _ts.tt(jd=t0 + dt / 86400))
+
+        def sunlit(dt):
+            return illumination(sat, _sun_table, _rotation, _ts.tt(jd=t0 + dt / 86400)) - 0.5
+
+        def visible(dt):
+            t = _ts.tt(jd=t0 + dt / 86400)
+            dark = sun_altitude(_obs, sun_itrf(_sun_table, _rotation, t)) < radians(sun_max_alt)
+            return dark & (illumination(sat, _sun_table, _rotation, t) > 0.5)
+
+        found = find_pass(alt_az, backward)
+        if sun_max_alt is not None:
+            while found is not None and not pass_visible(visible, found):
+                found = _following_pass(alt_az, found, backward)  # before the shadow computation
+        eclipse = find_eclipse(sunlit, found) if found is not None and _sun_table is not None else None
+        results.append((name, sat.model.satnum, found, eclipse))
+    return results
+
+
+class PassPool(object):
+    """ Next pass of many satellites computed by a pool of processes
+
+    Each worker process receives the timescale, the observer and the Sun positions once and rebuilds the satellites
+    from their TLE, the results are identical to SatTrack.next_pass(). The computation is stopped by cancel().
+    """
+
+    def __init__(self, ts, obs, workers=None, sun_table=None):
+        """
+        :param ts: Skyfield Timescale
+        :param obs: Skyfield Topos of the observer
+        :param workers: number of processes, number of CPU if omitted
+        :param sun_table: SunTable filled for the search window, the shadow entry and exit are not computed if omitted
+        """
+        self.ts = ts
+        self.obs = obs
+        self.sun_table = sun_table
+        self.workers = workers if workers is not None else cpu_count()
+        self.cancelled = False
+
+    def run(self, tles, t0, backward=False, progress=None, sun_max_alt=None):
+        """
+        Generator of the next passes, yielded as soon as each chunk of satellites is completed
+        :param tles: list of (name, line1, line2)
+        :param t0: Skyfield Time object, start of the search
+        :param backward: backward = True will search the previous pass
+        :param progress: optional function progress(done, total) called after each chunk
+        :param sun_max_alt: maximal altitude of the Sun in deg, if given the passes during which the satellite is never
+            illuminated while the Sun is below this altitude are skipped, "no pass" if no visible pass is found in the
+            search window. Requires the sun_table
+        :return: yield (name, satnum, pass) with pass in the SatTrack.next_pass() format
+        """
+        self.cancelled = False
+        t0 = t0.tt
+        chunks = [tles[i:i + POOL_CHUNK] for i in range(0, len(tles), POOL_CHUNK)]
+        done = 0
+        # spawned rather than forked: run() is called from a thread of the GUI process, a fork would copy its locks
+        executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_worker, initargs=(self.ts, self.obs, self.sun_table))
+        pending = set()
+        try:
+            pending = {executor.submit(_chunk_passes, chunk, t0, backward, sun_max_alt) for chunk in chunks}
+            while pending and not self.cancelled:
+                completed, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    for name, satnum, found, eclipse in future.result():
+                        done += 1
+                        yield name, satnum, pass_tuple(self.ts, t0, found, eclipse)
+                    if progress is not None:
+                        progress(done, len(tles))
+                    if self.cancelled:
+                        break
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=not self.cancelled)
+
+    def cancel(self):
+        """ Stop the computation, the generator returned by run() ends at the next chunk """
+        self.cancelled = True
@@ -0,0 +1,253 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+from numpy import arange, arcsin, arctan2, argmax, ceil, concatenate, einsum, flatnonzero, linspace, minimum, sqrt, where
+from skyfield.earthlib import terra
+from skyfield.functions import rot_z
+from skyfield.units import Angle
+
+COARSE_STEP = 120  # s, much less than a LEO orbit
+FINE_STEP = 1  # s, time resolution of the events
+SEARCH_WINDOW = 86400  # s
+GRAZING_MARGIN = 0.02  # rad, margin used to detect the passes shorter than COARSE_STEP
+ECLIPSE_STEP = 30  # s, sampling of the shadow along a pass, much less than the shadow crossing of a LEO satellite
+ECLIPSE_TOLERANCE = 0.1  # s, accuracy of the shadow entry and exit
+
+
+def altaz(sat, obs, t):
+    """
+    Vectorized alt,az of a satellite, equivalent to sat_pos() followed by radec2altaz()
+    :param sat: Skyfield EarthSatellite
+    :param obs: Skyfield Topos of the observer
+    :param t: Skyfield Time object, can contain an array of dates
+    :return: alt, az in rad (arrays if t is an array)
+    """
+    # The earth rotation, precession and nutation used to go through the GCRS cancel out: the computation is done in
+    # the terrestrial frame (ITRF) to avoid the costly nutation series
+    sat_itrf = sat.ITRF_position_velocity_error(t)[0]
+    obs_itrf, rot = local_frame(obs)
+    xyz = einsum("ij,j...->i...", rot, (sat_itrf.T - obs_itrf).T)
+    dist = sqrt(einsum("i...,i...->...", xyz, xyz))
+    return arcsin(xyz[2] / dist), arctan2(xyz[1], xyz[0])
+
+
+def local_frame(obs):
+    """
+    Observer position and orientation in the terrestrial frame
+    :param obs: Skyfield Topos of the observer
+    :return: observer position in the ITRF (au), rotation matrix from the ITRF to the local alt/az frame
+    """
+    obs_itrf = terra(obs.latitude.radians, obs.longitude.radians, obs.elevation.au, 0.)[0]
+    rot = einsum("ij,jk->ik", obs.R_lat, rot_z(-obs.longitude.radians))
+    return obs_itrf, rot
+
+
+def find_pass(alt_az, backward=False, log=None):
+    """
+    Vectorized search of the next pass. The altitude is evaluated on a coarse time grid covering the search window in
+    a single call, the pass is located on the grid and only the brackets of the events are refined.
+
+    :param alt_az: function returning the alt and az arrays (in rad) for an array of time offsets (in s)
+    :param backward: backward = True will search the previous pass
+    :param log: optional logging function log(level, text, *args), see SatTrack.log()
+    :return: ((dt_rise, dt_culmination, dt_meridian, dt_set), (alt_rise, ...), (az_rise, ...)) with the offsets in s
+        and the angles in rad, None for the events that do not happen in the search window, or None if no pass is found
+    """
+    if log is None:
+        def log(level, text, *args):
+            pass
+
+    direction = -1 if backward else 1
+
+    # The search starts FINE_STEP after t0 so that the set (or rise) date of a pass is not found again
+    dt = direction * (FINE_STEP + arange(0, SEARCH_WINDOW + COARSE_STEP, COARSE_STEP))
+    if backward:
+        dt = dt[::-1]  # all the arrays are in chronological order
+    alt, az = alt_az(dt)
+    start = len(dt) - 1 if backward else 0
+    log(3, "Coarse search: {0} points from dt={1} to dt={2}", len(dt), dt[0], dt[-1])
+
+    # pass in progress at t0: extend the grid on the other side of the starting point to find its rise (or set)
+    if alt[start] > 0:
+        ext = dt[start] - direction * arange(SEARCH_WINDOW, 0, -COARSE_STEP)
+        if backward:
+            ext = ext[::-1]
+        alt_ext, az_ext = alt_az(ext)
+        if backward:
+            dt, alt, az = concatenate((dt, ext)), concatenate((alt, alt_ext)), concatenate((az, az_ext))
+        else:
+            dt, alt, az = concatenate((ext, dt)), concatenate((alt_ext, alt)), concatenate((az_ext, az))
+            start = len(ext)
+        log(3, "Pass in progress, grid extended to dt={0}", ext[0] if not backward else ext[-1])
+
+    above = alt > 0
+    idx = flatnonzero(above[start:] if not backward else above[:start + 1])
+    if len(idx):
+        first = start + idx[0] if not backward else idx[-1]
+    else:
+        first = None
+
+    # passes shorter than the coarse step may fall between two points: look for the local maxima that are close to
+    # the horizon before the first point above the horizon
+    y0, y1, y2 = alt[:-2], alt[1:-1], alt[2:]
+    peak = y1 - (y0 - y2) ** 2 / (8 * minimum(y0 - 2 * y1 + y2, -1e-12))  # top of the parabola through the points
+    grazing = flatnonzero((y1 >= y0) & (y1 >= y2) & (y1 <= 0) & (peak > -GRAZING_MARGIN)) + 1
+    if not backward:
+        grazing = grazing[(grazing > start) & (grazing < (len(dt) if first is None else first))]
+    else:
+        grazing = grazing[(grazing < start) & (grazing > (-1 if first is None else first))][::-1]
+    if len(grazing):
+        fine = [arange(dt[i - 1], dt[i + 1] + FINE_STEP / 2, FINE_STEP) for i in grazing]
+        fine_alt, fine_az = alt_az(concatenate(fine))
+        offset = 0
+        for segment in fine:
+            seg_alt = fine_alt[offset:offset + len(segment)]
+            seg_az = fine_az[offset:offset + len(segment)]
+            offset += len(segment)
+            seg_above = flatnonzero(seg_alt > 0)
+            if len(seg_above):
+                log(3, "Short pass found between dt={0} and dt={1}", segment[0], segment[-1])
+                i_rise, i_set = seg_above[0], seg_above[-1]
+                i_culmination = argmax(seg_alt)
+                i_meridian = _first_sign_change(seg_az[i_rise:i_set + 1])
+                events = [i_rise, i_culmination, None if i_meridian is None else i_rise + i_meridian - 1, i_set]
+                return tuple(tuple(None if i is None else values[i] for i in events)
+                             for values in (segment, seg_alt, seg_az))
+
+    if first is None:
+        log(2, "no other pass for today")
+        return None
+
+    # coarse location of the pass
+    not_above = flatnonzero(~above[:first])
+    a = not_above[-1] + 1 if len(not_above) else 0
+    not_above = flatnonzero(~above[first:])
+    b = first + not_above[0] - 1 if len(not_above) else len(dt) - 1
+    k = a + argmax(alt[a:b + 1])
+    if (k == len(dt) - 1 and not backward) or (k == 0 and backward):
+        log(3, "no culmination today")
+        return None
+    log(3, "Pass between dt={0} and dt={1}, culmination near dt={2}", dt[a], dt[b], dt[k])
+
+    # refine the rise, culmination and set brackets in a single call
+    brackets = [(dt[max(k - 1, 0)], dt[min(k + 1, len(dt) - 1)])]
+    if a > 0:
+        brackets.append((dt[a - 1], dt[a]))
+    if b < len(dt) - 1:
+        brackets.append((dt[b], dt[b + 1]))
+    fine = [arange(lo, hi + FINE_STEP / 2, FINE_STEP) for lo, hi in brackets]
+    fine_alt, fine_az = alt_az(concatenate(fine))
+    n = [len(segment) for segment in fine]
+
+    i = argmax(fine_alt[:n[0]])
+    culmination = fine[0][i], fine_alt[i], fine_az[i]
+    offset = n[0]
+    rise = (None, None, None)
+    if a > 0:
+        i = offset + flatnonzero(fine_alt[offset:offset + n[1]] > 0)[0]
+        rise = fine[1][i - offset], fine_alt[i], fine_az[i]
+        offset += n[1]
+    else:
+        log(3, "no rise today")
+    set_ = (None, None, None)
+    if b < len(dt) - 1:
+        i = offset + flatnonzero(fine_alt[offset:offset + n[-1]] > 0)[-1]
+        set_ = fine[-1][i - offset], fine_alt[i], fine_az[i]
+    else:
+        log(3, "no set today")
+
+    # meridian crossing: sign change of the azimuth between the rise and the set
+    meridian = (None, None, None)
+    if rise[0] is not None and set_[0] is not None:
+        samples = sorted(zip(concatenate((dt[a:b + 1], concatenate(fine))), concatenate((az[a:b + 1], fine_az))))
+        samples = [s for s in samples if rise[0] <= s[0] <= set_[0]]
+        i = _first_sign_change([s[1] for s in samples])
+        if i is None:
+            log(3, "no meridian crossing")
+        else:
+            segment = arange(samples[i - 1][0], samples[i][0] + FINE_STEP / 2, FINE_STEP)
+            seg_alt, seg_az = alt_az(segment)
+            j = _first_sign_change(seg_az)
+            j = 0 if j is None else j - 1  # last point before the crossing
+            meridian = segment[j], seg_alt[j], seg_az[j]
+            log(3, "Meridian crossing between dt={0} and dt={1}", segment[0], segment[-1])
+
+    events = (rise, culmination, meridian, set_)
+    return tuple(tuple(event[i] for event in events) for i in range(3))
+
+
+def find_eclipse(sunlit, found):
+    """
+    Shadow entry and exit during a pass. The shadow is sampled along the pass in a single call, then all the sign
+    changes are refined together by bisection.
+
+    :param sunlit: function returning an array, positive when the satellite is illuminated, for an array of time
+        offsets (in s)
+    :param found: pass returned by find_pass()
+    :return: (dt_entry, dt_exit) in s, None for the events that do not happen during the pass
+    """
+    dt = _pass_samples(found)
+    lit = sunlit(dt) > 0
+    i = flatnonzero(lit[1:] != lit[:-1])
+    lo, hi, lo_lit = dt[i], dt[i + 1], lit[i]
+    while len(i) and (hi - lo).max() > ECLIPSE_TOLERANCE:
+        mid = (lo + hi) / 2
+        same = (sunlit(mid) > 0) == lo_lit
+        lo, hi = where(same, mid, lo), where(same, hi, mid)
+
+    entry = exit_ = None
+    for k in range(len(i)):
+        if lo_lit[k] and entry is None:
+            entry = (lo[k] + hi[k]) / 2
+        elif not lo_lit[k] and exit_ is None:
+            exit_ = (lo[k] + hi[k]) / 2
+    return entry, exit_
+
+
+def pass_visible(visible, found):
+    """
+    Check if a satellite can be seen during a pass, sampled along the pass in a single call
+    :param visible: function returning a boolean array, True when the satellite is illuminated and the sky is dark, for
+        an array of time offsets (in s)
+    :param found: pass returned by find_pass()
+    :return: True if the satellite is visible during a part of the pass
+    """
+    return bool(visible(_pass_samples(found)).any())
+
+
+def pass_tuple(ts, t0, found, eclipse=None):
+    """
+    Convert the result of find_pass() in the format returned by SatTrack.next_pass()
+    :param ts: Skyfield Timescale
+    :param t0: start of the search as a TT julian date
+    :param found: result of find_pass()
+    :param eclipse: result of find_eclipse(), None if it was not computed
+    :return: ((t_rise, t_culmination, t_meridian, t_set, t0), (alt_rise, ...), (az_rise, ...),
+        (t_shadow_entry, t_shadow_exit)) with Skyfield Time and Angle objects
+    """
+    if found is None:
+        return (None, None, None, None, t0), (None, None, None, None), (None, None, None, None), (None, None)
+
+    dt_events, alt_events, az_events = found
+    t_events = tuple(None if dt is None else ts.tt(jd=t0 + dt / 86400) for dt in dt_events)
+    alt_events = tuple(None if alt is None else Angle(radians=alt, preference="degrees") for alt in alt_events)
+    az_events = tuple(None if az is None else Angle(radians=az, preference="degrees") for az in az_events)
+    eclipse_events = tuple(None if dt is None else ts.tt(jd=t0 + dt / 86400)
+                           for dt in (eclipse if eclipse is not None else (None, None)))
+    return t_events + (t0,), alt_events, az_events, eclipse_events
+
+
+def _first_sign_change(values):
+    """ Index of the first value whose sign differs from the previous one, None if the sign never changes """
+    for i in range(1, len(values)):
+        if values[i - 1] * values[i] <= 0:
+            return i
+    return None
+
+
+def _pass_samples(found):
+    """ Time offsets sampling a pass returned by find_pass() with a step of about ECLIPSE_STEP """
+    dt_events = found[0]
+    start = dt_events[0] if dt_events[0] is not None else dt_events[1]
+    end = dt_events[3] if dt_events[3] is not None else dt_events[1]
+    return linspace(start, end, max(int(ceil((end - start) / ECLIPSE_STEP)), 1) + 1)
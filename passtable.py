@@ -0,0 +1,183 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+from numpy import (arange, arcsin, arctan2, argmax, cos, einsum, floor, full, inf, isnan, radians, sin, sqrt, stack,
+                   where)
+from sgp4.api import Satrec, SatrecArray
+from skyfield.constants import AU_KM
+from skyfield.sgp4lib import theta_GMST1982
+
+from passsearch import FINE_STEP, local_frame
+from shadow import SUN_MAX_ALT, sun_altitude, sunlit_fraction
+
+TABLE_STEP = 60  # s, passes shorter than this step may be missed
+TABLE_CHUNK = 500  # number of satellites propagated at once, limit the memory to a few tens of MB
+
+
+class PassSummary(object):
+    """ Next pass of a satellite as displayed in the pass table """
+
+    def __init__(self, name, satnum, t_rise, t_culmination, t_set, alt_max, t0):
+        self.name = name
+        self.satnum = satnum
+        self.t_rise = t_rise  # Skyfield Time, None if the satellite is already above the horizon at t0
+        self.t_culmination = t_culmination
+        self.t_set = t_set  # None if the satellite does not set within the search window
+        self.alt_max = alt_max  # rad
+        self.t0 = t0  # Skyfield Time, start of the search
+
+    def duration(self):
+        """ Duration of the pass in s, or of its remaining part from t0 if the satellite is already up """
+        if self.t_set is None:
+            return None
+        start = self.t_rise if self.t_rise is not None else self.t0
+        return (self.t_set.tt - start.tt) * 86400.
+
+
+def read_tle(path):
+    """
+    Read a TLE file in the same way as Skyfield but without building the satellites
+    :param path: path to the TLE file
+    :return: list of (name, line1, line2), name is None for 2-line files
+    """
+    tles = []
+    with open(path, "rb") as f:
+        b0 = b1 = b''
+        for b2 in f:
+            if b1.startswith(b'1 ') and len(b1) >= 69 and b2.startswith(b'2 ') and len(b2) >= 69:
+                b0 = b0.rstrip(b'\n\r')
+                if len(b0) == 24:  # Celestrak
+                    name = b0.decode('ascii').rstrip()
+                elif b0.startswith(b'0 '):  # Spacetrack 3-line format
+                    name = b0[2:].decode('ascii').rstrip()
+                else:
+                    name = None
+                tles.append((name, b1.decode('ascii').rstrip(), b2.decode('ascii').rstrip()))
+            b0 = b1
+            b1 = b2
+    return tles
+
+
+def batch_itrf(satrecs, t):
+    """
+    Position of several satellites at several dates propagated with a single SGP4 call
+    :param satrecs: SatrecArray of the satellites
+    :param t: Skyfield Time object containing an array of dates
+    :return: SGP4 error codes of shape (satellites, dates), positions in km in the ITRF of shape (satellites, dates, 3)
+    """
+    utc = t._utc_float()  # SGP4 dates are in UTC, like in Skyfield
+    jd = floor(utc)
+    err, r, v = satrecs.sgp4(jd, utc - jd)
+
+    # TEME to ITRF (AIAA 2006-6753 Appendix C, without polar motion)
+    theta = theta_GMST1982(t.ut1)[0]
+    cos_theta, sin_theta = cos(theta), sin(theta)
+    itrf = stack((cos_theta * r[..., 0] + sin_theta * r[..., 1],
+                  cos_theta * r[..., 1] - sin_theta * r[..., 0],
+                  r[..., 2]), axis=-1)
+    return err, itrf
+
+
+def batch_altaz(satrecs, obs, t):
+    """
+    Alt, az of several satellites at several dates propagated with a single SGP4 call
+    :param satrecs: SatrecArray of the satellites
+    :param obs: Skyfield Topos of the observer
+    :param t: Skyfield Time object containing an array of dates
+    :return: alt, az arrays in rad of shape (satellites, dates), NaN when SGP4 fails
+    """
+    return _itrf_altaz(obs, *batch_itrf(satrecs, t))
+
+
+def _itrf_altaz(obs, err, itrf):
+    """ Alt, az of the positions returned by batch_itrf() """
+    obs_itrf, rot = local_frame(obs)
+    xyz = einsum("ij,stj->sti", rot, itrf - obs_itrf * AU_KM)
+    dist = sqrt(einsum("sti,sti->st", xyz, xyz))
+    alt = where(err == 0, arcsin(xyz[..., 2] / dist), float("nan"))
+    az = where(err == 0, arctan2(xyz[..., 1], xyz[..., 0]), float("nan"))
+    return alt, az
+
+
+def batch_passes(tles, obs, ts, t0, duration=86400, min_alt=0., sun=None, sun_max_alt=SUN_MAX_ALT):
+    """
+    Next pass of every satellite of a catalog. The satellites are propagated by chunks over the whole search window
+    with array-backed SGP4, the rise and set dates are interpolated between the points of the time grid and only the
+    culmination is refined.
+
+    If the position of the Sun is given, only the visible passes are kept: the satellite must be illuminated while the
+    Sun is below sun_max_alt. The dark part of the window is computed once for the whole catalog and the satellites
+    are only propagated there, the passes then start and end when the satellite becomes visible and invisible.
+
+    :param tles: list of (name, line1, line2)
+    :param obs: Skyfield Topos of the observer
+    :param ts: Skyfield Timescale
+    :param t0: Skyfield Time object, start of the search
+    :param duration: length of the search window in s
+    :param min_alt: minimal altitude in rad
+    :param sun: optional function returning the geocentric position of the Sun in km in the ITRF, of shape (3, n), for
+        a Skyfield Time object containing an array of dates
+    :param sun_max_alt: maximal altitude of the Sun in deg for the visible passes
+    :return: list of PassSummary, one for each satellite that passes above min_alt during the search window
+    """
+    dt = arange(0, duration + TABLE_STEP, TABLE_STEP)
+    t = ts.tt(jd=t0.tt + dt / 86400)
+    n = len(dt)
+    index = arange(n)
+
+    def t_at(x):
+        return ts.tt(jd=t0.tt + x / 86400)
+
+    if sun is not None:
+        sun_position = sun(t)
+        dark = sun_altitude(obs, sun_position) < radians(sun_max_alt)
+        if not dark.any():
+            return []
+        t_dark = ts.tt(jd=t.tt[dark])
+        sun_dark = sun_position[:, None, dark]
+
+    passes = []
+    for chunk in range(0, len(tles), TABLE_CHUNK):
+        chunk_tles = tles[chunk:chunk + TABLE_CHUNK]
+        satrecs = [Satrec.twoline2rv(line1, line2) for name, line1, line2 in chunk_tles]
+        if sun is None:
+            alt = batch_altaz(SatrecArray(satrecs), obs, t)[0]
+        else:
+            # the points of the grid where the satellite is not visible are handled as below the horizon
+            err, itrf = batch_itrf(SatrecArray(satrecs), t_dark)
+            sunlit = sunlit_fraction(itrf.transpose(2, 0, 1), sun_dark) > 0.5
+            alt = full((len(satrecs), n), -inf)
+            alt[:, dark] = where(sunlit, _itrf_altaz(obs, err, itrf)[0], -inf)
+        alt[isnan(alt)] = -inf
+        above = alt > min_alt
+
+        # first pass: from the first point above the horizon to the next point below
+        has_pass = above.any(axis=1)
+        first = argmax(above, axis=1)
+        below_after = ~above & (index >= first[:, None])
+        has_set = below_after.any(axis=1)
+        last = where(has_set, argmax(below_after, axis=1), n) - 1
+        in_pass = above & (index >= first[:, None]) & (index <= last[:, None])
+        k = argmax(where(in_pass, alt, -inf), axis=1)
+
+        for s in where(has_pass)[0]:
+            f, l, m = first[s], last[s], k[s]
+            a = alt[s]
+            if f > 0:
+                dt_rise = dt[f] - TABLE_STEP * (a[f] - min_alt) / (a[f] - a[f - 1])
+            else:
+                dt_rise = None
+            if has_set[s]:
+                dt_set = dt[l] + TABLE_STEP * (a[l] - min_alt) / (a[l] - a[l + 1])
+            else:
+                dt_set = None
+
+            # the culmination is refined with a fine grid around the highest point
+            fine = arange(dt[max(m - 1, 0)], dt[min(m + 1, n - 1)] + FINE_STEP / 2, FINE_STEP)
+            fine_alt = batch_altaz(SatrecArray([satrecs[s]]), obs, t_at(fine))[0][0]
+            i = argmax(where(isnan(fine_alt), -inf, fine_alt))
+            dt_culmination, alt_max = fine[i], fine_alt[i]
+
+            passes.append(PassSummary(chunk_tles[s][0], satrecs[s].satnum, None if dt_rise is None else t_at(dt_rise),
+                                      t_at(dt_culmination), None if dt_set is None else t_at(dt_set), alt_max, t0))
+    return passes
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'passtabledialog.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Passtabledialog(object):
+    def setupUi(self, Passtabledialog):
+        Passtabledialog.setObjectName("Passtabledialog")
+        Passtabledialog.resize(640, 480)
+        self.verticalLayout = QtWidgets.QVBoxLayout(Passtabledialog)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.label = QtWidgets.QLabel(Passtabledialog)
+        self.label.setObjectName("label")
+        self.horizontalLayout.addWidget(self.label)
+        self.duration_spinbox = QtWidgets.QSpinBox(Passtabledialog)
+        self.duration_spinbox.setMinimum(1)
+        self.duration_spinbox.setMaximum(24)
+        self.duration_spinbox.setProperty("value", 12)
+        self.duration_spinbox.setObjectName("duration_spinbox")
+        self.horizontalLayout.addWidget(self.duration_spinbox)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.visible_checkbox = QtWidgets.QCheckBox(Passtabledialog)
+        self.visible_checkbox.setObjectName("visible_checkbox")
+        self.horizontalLayout.addWidget(self.visible_checkbox)
+        self.exact_checkbox = QtWidgets.QCheckBox(Passtabledialog)
+        self.exact_checkbox.setObjectName("exact_checkbox")
+        self.horizontalLayout.addWidget(self.exact_checkbox)
+        self.compute_btn = QtWidgets.QPushButton(Passtabledialog)
+        self.compute_btn.setObjectName("compute_btn")
+        self.horizontalLayout.addWidget(self.compute_btn)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+        self.pass_table = QtWidgets.QTableWidget(Passtabledialog)
+        self.pass_table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.pass_table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.pass_table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.pass_table.setObjectName("pass_table")
+        self.pass_table.setColumnCount(5)
+        self.pass_table.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.pass_table.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.pass_table.setHorizontalHeaderItem(1, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.pass_table.setHorizontalHeaderItem(2, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.pass_table.setHorizontalHeaderItem(3, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.pass_table.setHorizontalHeaderItem(4, item)
+        self.pass_table.horizontalHeader().setStretchLastSection(True)
+        self.pass_table.verticalHeader().setVisible(False)
+        self.verticalLayout.addWidget(self.pass_table)
+        self.progress_bar = QtWidgets.QProgressBar(Passtabledialog)
+        self.progress_bar.setProperty("value", 0)
+        self.progress_bar.setObjectName("progress_bar")
+        self.verticalLayout.addWidget(self.progress_bar)
+        self.status_lbl = QtWidgets.QLabel(Passtabledialog)
+        self.status_lbl.setText("")
+        self.status_lbl.setObjectName("status_lbl")
+        self.verticalLayout.addWidget(self.status_lbl)
+        self.buttonBox = QtWidgets.QDialogButtonBox(Passtabledialog)
+        self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Close)
+        self.buttonBox.setObjectName("buttonBox")
+        self.verticalLayout.addWidget(self.buttonBox)
+
+        self.retranslateUi(Passtabledialog)
+        self.buttonBox.rejected.connect(Passtabledialog.reject) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(Passtabledialog)
+
+    def retranslateUi(self, Passtabledialog):
+        _translate = QtCore.QCoreApplication.translate
+        Passtabledialog.setWindowTitle(_translate("Passtabledialog", "Next passes"))
+        self.label.setText(_translate("Passtabledialog", "Search window:"))
+        self.duration_spinbox.setSuffix(_translate("Passtabledialog", " h"))
+        self.visible_checkbox.setToolTip(_translate("Passtabledialog", "Only the passes during which the satellite is illuminated while the sky is dark"))
+        self.visible_checkbox.setText(_translate("Passtabledialog", "Visible"))
+        self.exact_checkbox.setToolTip(_translate("Passtabledialog", "Same computation as the pass prediction of the selected satellite, on all the CPU cores"))
+        self.exact_checkbox.setText(_translate("Passtabledialog", "Exact"))
+        self.compute_btn.setText(_translate("Passtabledialog", "Compute"))
+        self.pass_table.setSortingEnabled(True)
+        item = self.pass_table.horizontalHeaderItem(0)
+        item.setText(_translate("Passtabledialog", "Satellite"))
+        item = self.pass_table.horizontalHeaderItem(1)
+        item.setText(_translate("Passtabledialog", "NORAD"))
+        item = self.pass_table.horizontalHeaderItem(2)
+        item.setText(_translate("Passtabledialog", "Rise"))
+        item = self.pass_table.horizontalHeaderItem(3)
+        item.setText(_translate("Passtabledialog", "Max elevation (°)"))
+        item = self.pass_table.horizontalHeaderItem(4)
+        item.setText(_translate("Passtabledialog", "Duration (min)"))
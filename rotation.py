@@ -0,0 +1,70 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+from numpy import array, einsum, floor, ndim, pi, stack, unique
+from skyfield.functions import rot_z
+
+ROTATION_STEP = 3600.  # s, step of the precession-nutation table, the interpolation error is below 1 mas
+ROTATION_CACHE = 1000  # maximal number of samples of the table
+
+
+class RotationCache(object):
+    """ Rotation from the ICRF to the terrestrial frame or to the alt-az frame of an observer, equivalent to
+    Topos._altaz_rotation()
+
+    The precession-nutation matrix and the equation of the equinoxes vary slowly: they are computed on a time grid,
+    kept in a table and linearly interpolated. Only the earth rotation (GMST) is computed at each call.
+    """
+
+    def __init__(self, ts, step=ROTATION_STEP):
+        """
+        :param ts: Skyfield Timescale
+        :param step: step of the precession-nutation table in s
+        """
+        self.ts = ts
+        self.step = step / 86400.  # days
+        self.table = dict()  # grid index: (precession-nutation matrix, equation of the equinoxes in h)
+
+    # noinspection PyProtectedMember
+    def _samples(self, k):
+        """ Precession-nutation matrices (3, 3, n) and equations of the equinoxes (n) at the grid indexes k """
+        keys, inverse = unique(k, return_inverse=True)
+        missing = [i for i in keys.tolist() if i not in self.table]
+        if missing:
+            if len(self.table) + len(missing) > ROTATION_CACHE:
+                self.table.clear()
+                missing = keys.tolist()
+            t = self.ts.tt(jd=array(missing) * self.step)
+            m = t.M.reshape(3, 3, -1)
+            eq_eq = (t._earth_tilt[2] / 3600.).reshape(-1)
+            for j, i in enumerate(missing):
+                self.table[i] = (m[:, :, j], eq_eq[j])
+        samples = [self.table[i] for i in keys.tolist()]
+        return stack([s[0] for s in samples], axis=-1)[:, :, inverse], array([s[1] for s in samples])[inverse]
+
+    def itrf_rotation(self, t):
+        """
+        Rotation matrix from the ICRF to the terrestrial frame (ITRF, without polar motion)
+        :param t: Skyfield Time object, can contain an array of dates
+        :return: matrix of shape (3, 3), or (3, 3, n) if t is an array
+        """
+        x = t.tt / self.step
+        k = floor(x)
+        w = (x - k).reshape(-1)
+        k = k.astype(int).reshape(-1)
+        m0, eq_eq0 = self._samples(k)
+        m1, eq_eq1 = self._samples(k + 1)
+        m = m0 * (1. - w) + m1 * w
+        eq_eq = eq_eq0 * (1. - w) + eq_eq1 * w
+        if ndim(x) == 0:
+            m, eq_eq = m[:, :, 0], eq_eq[0]
+        return einsum("ij...,jk...->ik...", rot_z(-(t.gmst + eq_eq) * pi / 12.), m)
+
+    def altaz_rotation(self, obs, t):
+        """
+        Rotation matrix from the ICRF to the alt-az frame
+        :param obs: Skyfield Topos of the observer
+        :param t: Skyfield Time object, can contain an array of dates
+        :return: matrix of shape (3, 3), or (3, 3, n) if t is an array
+        """
+        return einsum("ij,jk,kl...->il...", obs.R_lat, rot_z(-obs.longitude.radians), self.itrf_rotation(t))
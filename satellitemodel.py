@@ -0,0 +1,190 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import re
+from bisect import bisect_left
+
+from numpy import pi
+from PyQt5 import QtCore
+
+ORBITS = ("LEO", "MEO", "GEO", "HEO")
+LEO_MAX_PERIOD = 128.  # min
+GEO_MIN_PERIOD = 1400.  # min, geosynchronous orbits have a period of 1436 min
+GEO_MAX_PERIOD = 1500.  # min
+HEO_MIN_ECCENTRICITY = 0.25  # Molniya, Tundra, GTO...
+
+
+def orbit_class(mean_motion, eccentricity):
+    """
+    Orbit class of a satellite
+    :param mean_motion: mean motion in rad/min
+    :param eccentricity: eccentricity
+    :return: "LEO", "MEO", "GEO" or "HEO"
+    """
+    period = 2. * pi / mean_motion if mean_motion > 0 else float("inf")
+    if eccentricity > HEO_MIN_ECCENTRICITY:
+        return "HEO"
+    if period < LEO_MAX_PERIOD:
+        return "LEO"
+    if GEO_MIN_PERIOD <= period <= GEO_MAX_PERIOD:
+        return "GEO"
+    return "MEO"
+
+
+class SatelliteIndex(object):
+    """ Satellites of a SatelliteCatalog sorted by key, searched by name or NORAD number
+
+    The index is built once after each catalog update, the prefixes of the names and of the NORAD numbers are then
+    found by bisection.
+    """
+
+    def __init__(self, catalog=None):
+        """
+        :param catalog: SatelliteCatalog, must not be modified during the construction (tle_lock). Empty index if
+            omitted
+        """
+        entries = []
+        if catalog is not None:
+            for key, satnum, record in catalog.satellite_entries():
+                store, i = record.store, record.i
+                key = str(key)
+                entries.append((key.lower(), key, satnum, record.catalogs,
+                                orbit_class(float(store.mean_motion[i]), float(store.eccentricity[i]))))
+        entries.sort()
+        self.lower = [entry[0] for entry in entries]  # sorted
+        self.keys = [entry[1] for entry in entries]  # as displayed and accepted by SatTrack.selected_satellite
+        self.satnums = [entry[2] for entry in entries]
+        self.catalogs = [entry[3] for entry in entries]
+        self.orbits = [entry[4] for entry in entries]
+        self.numbers = sorted((str(satnum), row) for row, satnum in enumerate(self.satnums))
+        self.rows = {key: row for row, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, text="", catalog=None, orbit=None):
+        """
+        Satellites matching a search. The satellites whose name or NORAD number starts with the text come first, then
+        the names containing the text and the names containing its characters in the same order.
+        :param text: searched text, case insensitive, all the satellites if empty
+        :param catalog: only keep the satellites of this catalog if given
+        :param orbit: only keep the satellites of this orbit class if given, see orbit_class()
+        :return: rows of the index, list of their tier: 0 for a prefix, 1 for a substring, 2 for the other matches
+        """
+        text = text.strip().lower()
+        if text:
+            tiers = dict()
+            for row in range(bisect_left(self.lower, text), bisect_left(self.lower, text + "\uffff")):
+                tiers[row] = 0
+            for number, row in self.numbers[bisect_left(self.numbers, (text,)):
+                                            bisect_left(self.numbers, (text + "\uffff",))]:
+                tiers[row] = 0
+            fuzzy = re.compile(".*?".join(re.escape(c) for c in text))
+            for row, name in enumerate(self.lower):
+                if row not in tiers:
+                    if text in name:
+                        tiers[row] = 1
+                    elif fuzzy.search(name):
+                        tiers[row] = 2
+            rows = sorted(tiers, key=lambda r: (tiers[r], r))
+        else:
+            tiers = None
+            rows = range(len(self.keys))
+
+        rows = [row for row in rows if (catalog is None or catalog in self.catalogs[row]) and
+                (orbit is None or self.orbits[row] == orbit)]
+        return rows, [tiers[row] for row in rows] if tiers is not None else [0] * len(rows)
+
+
+class SatelliteListModel(QtCore.QAbstractListModel):
+    """ Satellites of a SatelliteIndex matching a search, model of the satellite combo box
+
+    The items are only formatted when the view displays them. When the index or the search changes, only the rows that
+    differ are removed or inserted: the views keep their current item and are not rebuilt.
+    """
+
+    def __init__(self, parent=None):
+        super(SatelliteListModel, self).__init__(parent)
+        self.satellites = SatelliteIndex()
+        self.text = ""
+        self.catalog = None
+        self.orbit = None
+        self.rows = []  # row in the index of each row of the model
+        self.order = []  # sort key (tier, lower case key, key) of each row of the model
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.rows):
+            return None
+        row = self.rows[index.row()]
+        if role == QtCore.Qt.DisplayRole or role == QtCore.Qt.EditRole:
+            return self.satellites.keys[row]
+        if role == QtCore.Qt.ToolTipRole:
+            return "NORAD {0}, {1}, {2}".format(self.satellites.satnums[row], self.satellites.orbits[row],
+                                               ", ".join(self.satellites.catalogs[row]))
+        return None
+
+    def key(self, row):
+        """ Key of the satellite of a row of the model """
+        return self.satellites.keys[self.rows[row]]
+
+    def find(self, key):
+        """ Row of the model of a satellite key, -1 if it is not in the model """
+        row = self.satellites.rows.get(str(key))
+        if row is None:
+            return -1
+        if not self.text.strip():  # the rows are sorted by key
+            i = bisect_left(self.order, (0, self.satellites.lower[row], self.satellites.keys[row]))
+            return i if i < len(self.rows) and self.rows[i] == row else -1
+        try:
+            return self.rows.index(row)
+        except ValueError:
+            return -1
+
+    def set_index(self, index):
+        """ Show the satellites of a new SatelliteIndex """
+        self.satellites = index
+        self._update()
+
+    def set_search(self, text="", catalog=None, orbit=None):
+        """ Show the satellites matching a search, see SatelliteIndex.search() """
+        self.text = text
+        self.catalog = catalog
+        self.orbit = orbit
+        self._update()
+
+    def _update(self):
+        """ Remove and insert the rows that differ between the current rows and the result of the search """
+        rows, tiers = self.satellites.search(self.text, self.catalog, self.orbit)
+        order = [(tier, self.satellites.lower[row], self.satellites.keys[row]) for row, tier in zip(rows, tiers)]
+        root = QtCore.QModelIndex()
+
+        # merge of two sorted lists, by runs of consecutive insertions or removals
+        i = j = 0
+        while i < len(self.order) or j < len(order):
+            if j < len(order) and (i == len(self.order) or order[j] < self.order[i]):
+                k = j
+                while k < len(order) and (i == len(self.order) or order[k] < self.order[i]):
+                    k += 1
+                self.beginInsertRows(root, i, i + k - j - 1)
+                self.rows[i:i] = rows[j:k]
+                self.order[i:i] = order[j:k]
+                self.endInsertRows()
+                i += k - j
+                j = k
+            elif j == len(order) or self.order[i] < order[j]:
+                k = i
+                while k < len(self.order) and (j == len(order) or self.order[k] < order[j]):
+                    k += 1
+                self.beginRemoveRows(root, i, k - 1)
+                del self.rows[i:k]
+                del self.order[i:k]
+                self.endRemoveRows()
+            else:  # same satellite, moved in the new index
+                self.rows[i] = rows[j]
+                i += 1
+                j += 1
+        if self.rows:
+            self.dataChanged.emit(self.createIndex(0, 0), self.createIndex(len(self.rows) - 1, 0))
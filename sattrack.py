@@ -1,14 +1,34 @@
 """
 Author: Romain Fafet (farom57@gmail.com)
 """
-from numpy import cos, sin, arcsin, arctan2, einsum, sqrt, pi
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+
+from numpy import array, cos, sin, arcsin, arctan2, einsum, pi, radians
 from skyfield.api import load, Topos, Star, EarthSatellite
-from skyfield.positionlib import Geocentric
 from urllib.parse import urlparse
 from skyfield.units import Angle
 
+from catalogmanifest import FETCH_INTERVAL, CatalogManifest
+from controller import CONTROLLER_NAMES, CONTROLLERS, make_controller
+from controlloop import ControlLoop
+from elementstore import ElementStore, SatelliteCatalog
 from functions import *
 from indiclient import *
+from latency import compensate
+from logsink import LogSink
+from passsearch import COARSE_STEP, SEARCH_WINDOW, altaz, find_eclipse, find_pass, pass_tuple
+from passtable import batch_passes
+from rotation import RotationCache
+from shadow import SUN_MAX_ALT, SunTable, illumination, sun_altitude, sun_itrf
+from telemetry import TELEMETRY_DIR, TelemetryRecorder, telemetry_path
+from tracerecorder import TraceRecorder
+from trajectory import TRAJECTORY_MARGIN, TRAJECTORY_PREFETCH, Trajectory
+
+TLE_WORKERS = 4  # number of catalogs downloaded at the same time
+EPHEMERIS = "de421.bsp"  # JPL ephemeris of the Sun, downloaded on the first start
 
 
 class SatTrack(object):
@@ -19,7 +39,11 @@ class SatTrack(object):
     by start(), stop(), move(ra_angle,dec_angle) and goto_rise_and_wait().
     """
 
-    def __init__(self):
+    def __init__(self, wait=True):
+        """
+        :param wait: wait = False returns before the timescale, the catalogs and the ephemeris are loaded, they are
+            loaded by load_data()
+        """
 
         # configuration variables: they that can be assessed by the UI and saved
         self.indi_server_ip = "127.0.0.1"
@@ -55,14 +79,27 @@ class SatTrack(object):
         self._observer_lat = "43.7530 N"
         self._observer_lon = "6.9219 E"
         self.observer_offset = 0  # in days
+        self.sun_max_alt = SUN_MAX_ALT  # deg, the satellites are visible when the Sun is below this altitude
 
-        self.track_method = 0  # 0 = GOTO, 1 = Move, 2 = Timed moves, 3 = Speed
+        self.track_method = 0  # controller: 0 = P, 1 = PI, 2 = PID, 3 = P with acceleration feedforward
 
-        self.p_gain = 0.5
+        self.p_gain = 0.5  # 1/s
+        self.i_gain = 0.05  # 1/s²
+        self.d_gain = 0.
+        self.p_gain_dec = None  # gains of the DEC axis, None to use the same gains as the RA axis
+        self.i_gain_dec = None
+        self.d_gain_dec = None
         self.max_speed_ra = 1.  # deg/s
         self.max_speed_de = 1.  # deg/s
         self.joystick_speed = 1.  # deg/s
-        self.i_sat = 0.5
+        self.i_sat = 0.5  # deg/s, limit of the integral term
+        self.control_rate = 5.  # Hz, 0 to run the control each time the telescope coordinates are updated
+        self.display_rate = 1.  # Hz, update rate of the satellite and telescope state shown by the UI
+        self.latency_compensation = True  # the target is anticipated by the measured delay of the telescope
+        self.trace_file = None  # path of the binary trace of the tracking loop written during the tracking, see
+        # tracerecorder.py, None to disable it
+        self.telemetry_dir = TELEMETRY_DIR  # directory of the telemetry saved after each tracking, see telemetry.py,
+        # None to disable it
 
         self.connection_timeout = 1
 
@@ -72,19 +109,33 @@ class SatTrack(object):
 
         # dynamic data
         self.ui = None
+        self.log_sink = LogSink()  # the UI adds the log file
+        self.clock = None  # function returning the TT julian date to use a simulated time instead of the system clock
         self.indiclient = IndiClient(self)
-        self.ts = load.timescale()
+        self.ts = None  # the timescale, the ephemeris and the satellite are set by load_data()
+        self.rotation = None
+        self.earth = None
+        self.sun = None
+        self.sun_table = None
+        self.sat = None
         self.obs = Topos(self._observer_lat, self._observer_lon, None, None, self._observer_alt)
-        self.satellites_tle = dict()
-        self.update_tle()
-
-        planets = load('de421.bsp')
-        self.earth = planets['earth']
-        self.sun = planets['sun']
-
-        self.selected_satellite = self._selected_satellite
+        self.satellites_tle = SatelliteCatalog()
+        self.tle_lock = threading.Lock()
+        self.tle_generation = 0
+        self.tle_pending = 0  # number of catalogs being loaded
+        self.pass_pool = None
 
         self.tracking = False
+        self.trajectory = None
+        self.next_trajectory = None  # Future of the table following the current one, computed in background
+        self.control_loop = None
+        self.trace = None  # TraceRecorder during the tracking if trace_file is set
+        self.telemetry = None  # TelemetryRecorder, allocated at the first tracking if telemetry_dir is set
+        self.telemetry_start = None  # start of the tracking, None if the telemetry is not recorded
+        self.controller_ra = None
+        self.controller_dec = None
+        self.speed_ra = 0.  # last commanded speed in deg/s, before the inversion of direction
+        self.speed_dec = 0.
         self.offset_joystick_speed_dec = 0.  # deg/s
         self.offset_joystick_speed_ra = 0.
         self.offset_joystick_speed_FB = 0.  # Front / Back
@@ -102,6 +153,21 @@ class SatTrack(object):
         self.offset_LR = 0.
         self.offset_time = 0.
 
+        if wait:
+            self.load_data()
+
+    def __getstate__(self):
+        # SatTrack is sent to the processes of the tuning simulations: the GUI, the INDI connection, the catalogs,
+        # the ephemeris files and the threads are not transferred, the processes do not write the log, trace and
+        # telemetry files
+        state = self.__dict__.copy()
+        for key in ("ui", "indiclient", "earth", "sun", "sun_table", "pass_pool", "control_loop", "trajectory",
+                    "next_trajectory", "clock",
+                    "tle_lock", "trace", "trace_file", "telemetry", "telemetry_dir", "telemetry_start"):
+            state[key] = None
+        state["satellites_tle"] = SatelliteCatalog()
+        return state
+
     # Some properties to maintain to preserve internal consistency when attributes are updated and for error management
     @property
     def selected_satellite(self):
@@ -174,26 +240,71 @@ class SatTrack(object):
         ra, dec, distance = topocentric.radec()
         return ra, dec, distance
 
-    def illuminated(self, t=None):
-        """ return false if the satellite is in shadow """
+    def target_trajectory(self, t):
+        """
+        Trajectory table of the selected satellite containing t. When t gets close to the end of the table, the next
+        one is computed in background so that the control loop is not stalled by the computation: the tables are only
+        computed synchronously when the satellite or the observer change or when the time jumps.
+        """
+        trajectory = self.trajectory
+        if trajectory is not None and not trajectory.covers(t) and self.next_trajectory is not None:
+            trajectory = self.next_trajectory.result()  # only waits if the table is still being computed
+            self.next_trajectory = None
+        if trajectory is None or trajectory.sat is not self.sat or trajectory.obs is not self.obs \
+                or not trajectory.covers(t):
+            trajectory = Trajectory(self.sat, self.obs, self.ts, self.ts.tt(jd=t.tt - TRAJECTORY_MARGIN / 86400.))
+            self.next_trajectory = None
+            self.log(3, "Trajectory table computed from {0}", t.utc_iso())
+        self.trajectory = trajectory
+
+        if self.next_trajectory is None and t.tt > trajectory.t_end - TRAJECTORY_PREFETCH / 86400.:
+            # the next table overlaps the current one by the margin
+            start = self.ts.tt(jd=trajectory.t_end - TRAJECTORY_MARGIN / 86400.)
+            future = self.next_trajectory = Future()
+
+            def compute():
+                try:
+                    future.set_result(Trajectory(trajectory.sat, trajectory.obs, self.ts, start))
+                except Exception as err:
+                    future.set_exception(err)
+
+            threading.Thread(target=compute, name="trajectory", daemon=True).start()
+        return trajectory
+
+    def illumination(self, t=None):
+        """
+        Visible fraction of the solar disk seen from the satellite: 0 in the umbra, 1 when it is fully illuminated
+        :param t: Skyfield Time object, use current time if omitted. It can contain an array of dates
+        :return: fraction, float or array
+        """
         if t is None:
             t = self.t()
+        return illumination(self.sat, self.sun_table, self.rotation, t)
 
-        # projection of the earth center on the ray between the sun and the satellite
-        earth_sat_vect = self.sat.at(t).position.au
-        sun_sat_vect = (self.sat - (self.sun - self.earth)).at(t).position.au
-        product = scalar_product(earth_sat_vect, sun_sat_vect)
-
-        if product < 0:  # The satellite is in front of the earth
-            return True
-        else:  # The satellite is after the earth, let's check if the ray is underground
-            sun_sat_vect = sun_sat_vect / sqrt(scalar_product(sun_sat_vect, sun_sat_vect))  # normalize
-            earth_projection_vect = earth_sat_vect - scalar_product(earth_sat_vect, sun_sat_vect) * sun_sat_vect
-            earth_projection = Geocentric(position_au=earth_projection_vect, center=399, t=t)
-            return earth_projection.subpoint().elevation.m > 0.
+    def illuminated(self, t=None):
+        """ return false if the satellite is in shadow (the center of the Sun is hidden), array if t is an array """
+        return self.illumination(t) > 0.5
 
     def in_shadow(self, t=None):
-        return not self.illuminated(t)
+        return self.illumination(t) <= 0.5
+
+    def sun_alt(self, t=None):
+        """
+        Altitude of the Sun seen by the observer
+        :param t: Skyfield Time object, use current time if omitted. It can contain an array of dates
+        :return: altitude in rad, float or array
+        """
+        if t is None:
+            t = self.t()
+        return sun_altitude(self.obs, sun_itrf(self.sun_table, self.rotation, t))
+
+    def visible(self, t=None):
+        """ return true if the satellite can be seen: above the horizon, illuminated and in a dark sky. Array if t is an
+        array """
+        if t is None:
+            t = self.t()
+        return (altaz(self.sat, self.obs, t)[0] > 0) & (self.sun_alt(t) < radians(self.sun_max_alt)) & \
+            self.illuminated(t)
 
     def telescope_pos(self):
         """ Telescope position: ra, dec """
@@ -205,21 +316,21 @@ class SatTrack(object):
         else:
             raise Error("Unable to get the coordinates from the telescope")
 
-    # noinspection PyProtectedMember
-    def radec2altaz(self, ra: float, dec: float, t=None):
+    def radec2altaz(self, ra, dec, t=None):
         """
         Convert ra,dec in alt,az
-        :param ra: ra in rad
-        :param dec: dec in rad
-        :param t: Skyfield Time object, use current time if omitted
-        :return: alt, az in rad
+        :param ra: ra in rad, float or array
+        :param dec: dec in rad, float or array
+        :param t: Skyfield Time object, use current time if omitted. It can contain an array of dates of the same
+        length as ra and dec
+        :return: alt, az in rad, arrays if the inputs are arrays
         """
         if t is None:
             t = self.t()
-        rot = self.obs._altaz_rotation(t)
+        rot = self.rotation.altaz_rotation(self.obs, t)
         cosdec = cos(dec)
-        radec = [cosdec * cos(ra), cosdec * sin(ra), sin(dec)]
-        altaz = einsum("ij,j->i", rot, radec)
+        radec = array((cosdec * cos(ra), cosdec * sin(ra), sin(dec)))
+        altaz = einsum("ij...,j...->i...", rot, radec)
         alt = arcsin(altaz[2])
         az = arctan2(altaz[1], altaz[0])
         return alt, az
@@ -227,7 +338,7 @@ class SatTrack(object):
     def radec2altaz_2(self, ra: Angle, dec: Angle, t=None):
         """
         Convert ra,dec in alt,az
-        :param ra: ra as skyfield Angle object
+        :param ra: ra as skyfield Angle object, it can contain an array
         :param dec: dec as skyfield Angle object
         :param t: Skyfield Time object, use current time if omitted
         :return: alt, az as skyfield Angle object
@@ -235,38 +346,29 @@ class SatTrack(object):
         alt, az = self.radec2altaz(ra.radians, dec.radians, t)
         return Angle(radians=alt, preference="degrees"), Angle(radians=az, preference="degrees")
 
-    def altaz2radec(self, alt: float, az: float, t=None):
+    def altaz2radec(self, alt, az, t=None):
         """
         Convert alt,az in ra,dec
-        :param alt: alt in rad
-        :param az: az in rad
-        :param t: Skyfield Time object, use current time if omitted
-        :return: ra, dec in rad
+        :param alt: alt in rad, float or array
+        :param az: az in rad, float or array
+        :param t: Skyfield Time object, use current time if omitted. It can contain an array of dates of the same
+        length as alt and az
+        :return: ra in [0, 2pi[, dec in rad, arrays if the inputs are arrays
         """
         if t is None:
             t = self.t()
-
-        rot = self.obs._altaz_rotation(t)
+        rot = self.rotation.altaz_rotation(self.obs, t)
         cosalt = cos(alt)
-        altaz = [cosalt * cos(az), cosalt * sin(az), sin(alt)]
-        radec = einsum("ji,j->i", rot, altaz)
-
+        altaz = array((cosalt * cos(az), cosalt * sin(az), sin(alt)))
+        radec = einsum("ji...,j...->i...", rot, altaz)
         dec = arcsin(radec[2])
-        ra = arctan2(radec[1], radec[0])
-        ra = ra if ra >=0 else ra+2*pi
-
-        altaz_inv = einsum("ij,j->i", rot, radec)
-        cosdec = cos(dec)
-        radec = [cosdec * cos(ra), cosdec * sin(ra), sin(dec)]
-        altaz_2 = einsum("ij,j->i", rot, radec)
-        alt2 = arcsin(altaz_2[2])
-        az2 = arctan2(altaz_2[1], altaz_2[0])
+        ra = arctan2(radec[1], radec[0]) % (2 * pi)
         return ra, dec
 
     def altaz2radec_2(self, alt: Angle, az: Angle, t=None):
         """
         Convert alt,az in ra,dec
-        :param alt: alt as skyfield Angle object
+        :param alt: alt as skyfield Angle object, it can contain an array
         :param az: az as skyfield Angle object
         :param t: Skyfield Time object, use current time if omitted
         :return: ra, dec as skyfield Angle object
@@ -276,6 +378,8 @@ class SatTrack(object):
 
     def t(self):
         """ Current software time"""
+        if self.clock is not None:
+            return self.ts.tt(jd=self.clock())
         tmp = self.ts.now().tt + self.observer_offset
         return self.ts.tt(jd=tmp)
 
@@ -284,284 +388,228 @@ class SatTrack(object):
 
     def t_iso(self):
         """ Current software time in iso format"""
+        if self.ts is None:  # still loading
+            return "-"
         tmp = self.ts.now().tt + self.observer_offset
         return self.ts.tt(jd=tmp).utc_iso()
 
-    def log(self, level, text):
-        """ level: 0 for error, 1 for warning, 2 for common messages, 3 for extended logging """
-        if self.ui is not None:
-            if level == 0:
-                print("ERROR: " + text)
-                self.ui.log_browser.append("<font color=\"Red\">{0} - ERROR: {1}</font>"
-                                           .format(self.t_iso(), text))
-            elif level == 1:
-                print("WARNING: " + text)
-                self.ui.log_browser.append("<font color=\"Orange\">{0} - WARNING: {1}</font>"
-                                           .format(self.t_iso(), text))
-            elif level == 2:
-                print("Info: " + text)
-                self.ui.log_browser.append("<font color=\"Black\">{0} - Info: {1}</font>"
-                                           .format(self.t_iso(), text))
-            else:
-                pass
-                print("Debug: " + text)
-                # self.ui.log_browser.append("<font color=\"Blue\">{0} - Debug: {1}</font>"
-                # .format(self.t_iso(), text))
-
-    def update_tle(self, max_age=3):
-        """ Update satellite elements, only elements older than 'max_age' days are downloaded  """
-        self.satellites_tle = dict()
-        for catalog in self.catalogs:
-            if catalog.active:
-                try:
-                    current_tle = load.tle(catalog.url, filename=catalog.filename())  # try to get TLE from disk
-                    age = self.t() - current_tle[list(current_tle)[0]].epoch
-                    self.log(2, 'TLE for ' + catalog.name + ' are {:.3f} days old'.format(age))
-                    force_update = abs(age) > max_age
-                except OSError as err:
-                    self.log(1, "TLE file not found:\n" + str(err))
-                    force_update = True
-                    current_tle={}
-
-                if force_update:
-                    try:
-                        current_tle = load.tle(catalog.url, reload=True)
-                    except OSError as err:
-                        self.log(1, "Impossible to download TLE:\n" + str(err))
-
-                self.satellites_tle.update(current_tle)
+    def log(self, level, text, *args):
+        """
+        Log a message, for example log(3, "diff: {0:.4f} deg", diff) in a loop: the arguments are only formatted if the
+        level is enabled and when the message is shown
+        :param level: 0 for error, 1 for warning, 2 for common messages, 3 for extended logging
+        :param text: message, or format string of str.format() if there are arguments
 
+        The message is only queued, the UI flushes the queue periodically from the GUI thread: it can be logged from
+        the TLE update threads or the control loop. Without UI it is flushed immediately.
+        """
+        if not self.log_sink.enabled(level):
+            return
+        if self.clock is not None and self.ts is not None:
+            date = self.t().utc_datetime().timestamp()  # simulated time
+        else:
+            # dated with the software time, as t_iso() but without building a Skyfield Time
+            date = time.time() + self.observer_offset * 86400.
+        self.log_sink.log(level, text, args, date)
+        if self.ui is None:
+            self.log_sink.flush()
 
+    def load_data(self, wait=True, progress=None):
+        """
+        Load the timescale, the catalogs and the ephemeris, they are downloaded if they are missing or outdated. The UI
+        calls this method in a background thread to show the window first.
+        :param wait: return only when all the catalogs are loaded, otherwise they are loaded in background as by
+            update_tle() and the satellite is selected once its catalog is loaded
+        :param progress: optional function progress(text) called at the beginning of each step
+        """
+        if progress is not None:
+            progress("Loading the timescale")
+        ts = load.timescale()
+        self.rotation = RotationCache(ts)
+        self.ts = ts
+
+        self.update_tle(wait=wait)  # the catalogs are loaded concurrently with the ephemeris
+        if wait:
+            self.selected_satellite = self._selected_satellite
+
+        if progress is not None:
+            progress("Loading the ephemeris")
+        planets = load(EPHEMERIS)
+        self.earth = planets['earth']
+        self.sun = planets['sun']
+        self.sun_table = SunTable(self.ts, self.earth, self.sun)
 
+    def update_tle(self, max_age=3, wait=False):
+        """
+        Update satellite elements, only elements older than 'max_age' days are requested to the server. The catalogs
+        are loaded concurrently in background, the satellites of each catalog that have changed are merged in
+        satellites_tle as soon as it is loaded and the UI is notified by catalog_loaded().
+        :param max_age: maximal age of the elements in days
+        :param wait: return only when all the catalogs are loaded
+        """
+        with self.tle_lock:
+            self.tle_generation += 1  # the catalogs of the previous updates still running are ignored
+            catalogs = [catalog for catalog in self.catalogs if catalog.active]
+            for name in list(self.satellites_tle.stores):
+                if name not in [catalog.name for catalog in catalogs]:
+                    self.satellites_tle.remove(name)
+            self.tle_pending = len(catalogs)
+
+        executor = ThreadPoolExecutor(TLE_WORKERS)
+        for catalog in catalogs:
+            future = executor.submit(self.load_catalog, catalog, max_age)
+            future.add_done_callback(partial(self.merge_catalog, self.tle_generation, catalog))
+        executor.shutdown(wait=wait)
+
+    def load_catalog(self, catalog, max_age=3):
+        """
+        Load the element store of a catalog from the disk. If the median epoch of its elements is older than 'max_age'
+        days, the catalog is requested to the server with the ETag and the date of the last download, it is only
+        downloaded and parsed again if it has changed.
+        :return: ElementStore, None if the catalog is not available
+        """
+        path = load.path_to(catalog.filename())
+        manifest = CatalogManifest.load(path)
+        store = None
+        try:
+            store = ElementStore.open(path)  # try to get TLE from disk
+            if len(store) == 0:
+                raise OSError("no TLE in " + path)
+            if not manifest.fresh(store):  # manifest missing or saved for another file
+                manifest.update_statistics(store)
+            # judged on the median epoch: a few recently updated satellites do not make the whole catalog fresh
+            age = self.t().tt - manifest.epoch_median
+            self.log(2, "TLE for {0} are {1:.3f} days old", catalog.name, age)
+            force_update = abs(age) > max_age
+        except OSError as err:
+            self.log(1, "TLE file not found:\n" + str(err))
+            force_update = True
+        valid = store is not None and len(store) > 0
+
+        if force_update and valid and manifest.age() < FETCH_INTERVAL:
+            self.log(2, "{0} was requested {1:.0f} min ago", catalog.name, manifest.age() / 60.)
+        elif force_update:
+            try:
+                # without a valid local file, a 304 Not Modified answer would leave no TLE at all
+                if manifest.fetch(catalog.url, conditional=valid):
+                    store = ElementStore.open(path)
+                    manifest.update_statistics(store)
+                else:
+                    self.log(2, catalog.name + ' not modified since the last download')
+                manifest.save()
+            except OSError as err:
+                self.log(1, "Impossible to download TLE:\n" + str(err))
+        return store
+
+    def merge_catalog(self, generation, catalog, future):
+        """ Called in the update threads when a catalog is loaded """
+        try:
+            store = future.result()
+        except Exception as err:
+            self.log(0, "Error while loading {0}:\n{1}", catalog.name, err)
+            store = None
+
+        with self.tle_lock:
+            if generation != self.tle_generation:
+                return
+            merged = self.satellites_tle.add(store, catalog.name) if store is not None else 0
+            self.tle_pending -= 1
+            updated = merged and self._selected_satellite in self.satellites_tle and \
+                self.satellites_tle.record(self._selected_satellite).store is store
+
+        if merged:
+            self.log(2, "{0} satellites updated from {1}", merged, catalog.name)
+        if updated:
+            self.selected_satellite = self._selected_satellite  # updated elements
         if self.ui is not None:
-            self.ui.update_sat_list()
+            self.ui.catalog_loaded(catalog)
 
     # next pass prediction
     def next_pass(self, t0, backward=False):
         """
         Predict the next pass. Return a tuple containing the dates and alt az angles of the rise, culmination, meridian crossing and set, or None if the respective event does no happen.
-        Return ((None,None, None, None, t0),(None,None, None, None),(None,None, None, None)) if no pass is found.
+        The dates the satellite enters and leaves the shadow of the earth during the pass are appended, or None if they do not happen.
+        Return ((None,None, None, None, t0),(None,None, None, None),(None,None, None, None),(None, None)) if no pass is found.
 
         :param t0: time to start the search
         :param backward: backward = True will search the previous pass
-        :return: ((t_rise, t_culmination, t_meridian, t_set, t0), (alt_rise, alt_culmination, alt_meridian, alt_set), (az_rise, az_culmination, az_meridian, az_set))
+        :return: ((t_rise, t_culmination, t_meridian, t_set, t0), (alt_rise, alt_culmination, alt_meridian, alt_set), (az_rise, az_culmination, az_meridian, az_set), (t_shadow_entry, t_shadow_exit))
         """
         t0 = t0.tt
 
-        def alt_t(dt):
-            tjd = t0 + dt / 86400
-            ra, dec, dist = self.sat_pos(t=self.ts.tt(jd=tjd))
-            alt, az = self.radec2altaz(ra.radians, dec.radians, t=self.ts.tt(jd=tjd))
-            return alt
-
-        def az_t(dt):
-            tjd = t0 + dt / 86400
-            ra, dec, dist = self.sat_pos(t=self.ts.tt(jd=tjd))
-            alt, az = self.radec2altaz(ra.radians, dec.radians, t=self.ts.tt(jd=tjd))
-            return az
-
-        direction = -1 if backward else 1
-        step = 60 * 20  # less than 1/4 of orbit
-        small_step = 30  # few deg
-        smaller_step = 1  # time resolution
-        trajectory_segments = 20
-        dt0 = 0
-        dt_rise = None
-        dt_set = None
-        dt_meridian = None
-        dt_culmination = None
-
-        while True:
-            # Ascending / descending orbit coarse detection
-            alt0 = alt_t(dt0)
-            alt1 = alt_t(dt0 + step * direction)
-            while alt1 < alt0 and dt0 * direction < 86400 and alt1 < 0:
-                self.log(3, "Phase 1: Decreasing at dt0={0}, alt0={1}, alt1={2}".format(dt0, alt0, alt1))
-                alt0 = alt1
-                dt0 = dt0 + step * direction
-                alt1 = alt_t(dt0 + step * direction)
-
-            while alt1 >= alt0 and dt0 * direction < 86400:
-                self.log(3, "Phase 1: Increasing at dt0={0}, alt0={1}, alt1={2}".format(dt0, alt0, alt1))
-                alt0 = alt1
-                dt0 = dt0 + step * direction
-                alt1 = alt_t(dt0 + step * direction)
-
-            if dt0 * direction > 86400 and alt1 < 0:
-                self.log(2, "no other pass for today")
-                return (None, None, None, None, t0), (None, None, None, None), (None, None, None, None)
-
-            self.log(3,
-                     "Phase 1: Maximum between dt0={0} and {1}".format(dt0 - step * direction, dt0 + step * direction))
-            dt0 = dt0 - step * direction
-            alt0 = alt_t(dt0)
-            alt1 = alt_t(dt0 + small_step * direction)
-
-            # Refining the maximum altitude
-            while alt1 >= alt0 and alt1 < 10 and dt0 * direction < 86400:
-                self.log(3, "Phase 2: Increasing at dt0={0}, alt0={1}, alt1={2}".format(dt0, alt0, alt1))
-                alt0 = alt1
-                dt0 = dt0 + small_step * direction
-                alt1 = alt_t(dt0 + small_step * direction)
-
-            if alt1 < 0:
-                if dt0 * direction < 86400:
-                    continue  # restart the search for the following orbit
-                else:
-                    self.log(2, "no pass found")
-                    return (None, None, None, None, t0), (None, None, None, None), (None, None, None, None)
-            else:
-                # Refining a 2nd time the maximum altitude to get the date
-                alt1 = alt_t(dt0 + smaller_step * direction)
-                while alt1 >= alt0:
-                    if dt0 * direction > 86400:
-                        self.log(3, "no culmination today")
-                        return (None, None, None, None, t0), (None, None, None, None), (None, None, None, None)
-                    self.log(3, "Phase 3: Increasing at dt0={0}, alt0={1}, alt1={2}".format(dt0, alt0, alt1))
-                    alt0 = alt1
-                    dt0 = dt0 + smaller_step * direction
-                    alt1 = alt_t(dt0 + smaller_step * direction)
-                dt_culmination = dt0
-
-                # refining rise and set date by dichotomy
-                # set
-                dt0 = dt_culmination
-                alt0 = alt_t(dt_culmination)
-                alt1 = alt_t(dt_culmination + step)
-                while alt1 >= 0 and dt0 < 86400:
-                    self.log(3, "Phase 4 set: Increasing at dt0={0}, alt0={1}, alt1={2}".format(dt0, alt0, alt1))
-                    alt0 = alt1
-                    dt0 = dt0 + step
-                    alt1 = alt_t(dt0 + step)
-                if dt0 > 86400:
-                    self.log(3, "no set today")
-                else:
-                    dt1 = dt0 + step
-                    while dt1 - dt0 > smaller_step:
-                        dt2 = (dt0 + dt1) / 2
-                        alt2 = alt_t(dt2)
-
-                        if alt2 > 0:
-                            dt0 = dt2
-                            alt0 = alt2
-                        else:
-                            dt1 = dt2
-                            alt1 = alt2
-                        self.log(3,
-                                 "Phase 4 set: Restrict set date to dt={0} alt={1} to dt={2} alt={3}".format(dt0, alt0,
-                                                                                                             dt1,
-                                                                                                             alt1))
-                    dt_set = dt0
-
-                # rise
-                dt0 = dt_culmination
-                alt0 = alt_t(dt_culmination)
-                alt1 = alt_t(dt_culmination - step)
-                while alt1 >= 0 and dt0 > -86400:
-                    self.log(3, "Phase 4 rise: Increasing at dt0={0}, alt0={1}, alt1={2}".format(dt0, alt0, alt1))
-                    alt0 = alt1
-                    dt0 = dt0 - step
-                    alt1 = alt_t(dt0 - step)
-                if dt0 < -86400:
-                    self.log(3, "no rise today")
-                else:
-                    dt1 = dt0 - step
-                    while dt0 - dt1 > smaller_step:
-                        dt2 = (dt0 + dt1) / 2
-                        alt2 = alt_t(dt2)
-                        if alt2 > 0:
-                            dt0 = dt2
-                            alt0 = alt2
-                        else:
-                            dt1 = dt2
-                            alt1 = alt2
-                        self.log(3,
-                                 "Phase 4 rise: Restrict set date to dt={0} alt={1} to dt={2} alt={3}".format(dt0, alt0,
-                                                                                                              dt1,
-                                                                                                              alt1))
-                    dt_rise = dt0
-
-                # meridian
-                if (dt_rise is not None) and (dt_set is not None):
-                    dt0 = dt_rise
-                    dt1 = dt0 + (dt_set - dt_rise) / trajectory_segments
-                    az0 = az_t(dt0)
-                    az1 = az_t(dt1)
-                    while dt1 < dt_set and az0 * az1 > 0:  # equivalent to sign(az0)==sign(az1)
-                        dt0 = dt1
-                        dt1 = dt0 + (dt_set - dt_rise) / trajectory_segments
-                        az0 = az1
-                        az1 = az_t(dt1)
-                        self.log(3,
-                                 "Phase 5a: Segment dt={0} az={1} to dt={2} az={3}".format(dt0, az0, dt1, az1))
-                    if dt1 >= dt_set:
-                        self.log(3, "no meridian crossing")
-                    else:
-                        while dt1 - dt0 > smaller_step:
-                            dt2 = (dt0 + dt1) / 2
-                            az2 = az_t(dt2)
-                            if az2 * az0 > 0:
-                                dt0 = dt2
-                                az0 = az2
-                            else:
-                                dt1 = dt2
-                                az1 = az2
-                            self.log(3,
-                                     "Phase 5b: Restrict meridian crossing date to dt={0} az={1} to dt={2} az={3}"
-                                     .format(dt0, az0, dt1, az1))
-                        dt_meridian = dt0
-
-                if dt_rise is not None:
-                    t_rise = self.ts.tt(jd=t0 + dt_rise / 86400)
-                    alt_rise = Angle(radians=alt_t(dt_rise), preference="degrees")
-                    az_rise = Angle(radians=az_t(dt_rise), preference="degrees")
-                else:
-                    t_rise = None
-                    alt_rise = None
-                    az_rise = None
-
-                if dt_culmination is not None:
-                    t_culmination = self.ts.tt(jd=t0 + dt_culmination / 86400)
-                    alt_culmination = Angle(radians=alt_t(dt_culmination), preference="degrees")
-                    az_culmination = Angle(radians=az_t(dt_culmination), preference="degrees")
-                else:
-                    t_culmination = None
-                    alt_culmination = None
-                    az_culmination = None
-
-                if dt_meridian is not None:
-                    t_meridian = self.ts.tt(jd=t0 + dt_meridian / 86400)
-                    alt_meridian = Angle(radians=alt_t(dt_meridian), preference="degrees")
-                    az_meridian = Angle(radians=az_t(dt_meridian), preference="degrees")
-                else:
-                    t_meridian = None
-                    alt_meridian = None
-                    az_meridian = None
-
-                if dt_set is not None:
-                    t_set = self.ts.tt(jd=t0 + dt_set / 86400)
-                    alt_set = Angle(radians=alt_t(dt_set), preference="degrees")
-                    az_set = Angle(radians=az_t(dt_set), preference="degrees")
-                else:
-                    t_set = None
-                    alt_set = None
-                    az_set = None
-
-                self.log(2,
-                         "pass found:\n"
-                         " rise: dt={0} az={1}\n"
-                         " meridian:  dt={2} az={3} alt={4}\n"
-                         " culmination:  dt={5} az={6} alt={7}\n"
-                         " set: dt={8} az={9}"
-                         .format(dt_rise, az_rise,
-                                 dt_meridian, az_meridian, alt_meridian,
-                                 dt_culmination, az_culmination, alt_culmination,
-                                 dt_set, az_set))
-
-                return (
-                    (t_rise, t_culmination, t_meridian, t_set, t0),
-                    (alt_rise, alt_culmination, alt_meridian, alt_set),
-                    (az_rise, az_culmination, az_meridian, az_set))
+        def alt_az(dt):
+            return altaz(self.sat, self.obs, self.ts.tt(jd=t0 + dt / 86400))
+
+        def sunlit(dt):
+            return self.illumination(self.ts.tt(jd=t0 + dt / 86400)) - 0.5
+
+        found = find_pass(alt_az, backward, self.log)
+        eclipse = None
+        if found is not None and self.sun_table is not None:  # the ephemeris is not sent to the simulation processes
+            eclipse = find_eclipse(sunlit, found)
+        result = pass_tuple(self.ts, t0, found, eclipse)
+        if found is not None:
+            dt_events, alt_events, az_events = found[0], result[1], result[2]
+            self.log(2,
+                     "pass found:\n"
+                     " rise: dt={0} az={1}\n"
+                     " meridian:  dt={2} az={3} alt={4}\n"
+                     " culmination:  dt={5} az={6} alt={7}\n"
+                     " set: dt={8} az={9}\n"
+                     " shadow: entry dt={10} exit dt={11}",
+                     dt_events[0], az_events[0],
+                     dt_events[2], az_events[2], alt_events[2],
+                     dt_events[1], az_events[1], alt_events[1],
+                     dt_events[3], az_events[3],
+                     *(eclipse if eclipse is not None else (None, None)))
+        return result
+
+    def catalog_tle(self):
+        """ TLE lines (name, line1, line2) of the satellites of the active catalogs, one entry per satellite """
+        with self.tle_lock:
+            return self.satellites_tle.tles()
+
+    def catalog_passes(self, t0=None, duration=86400, visible=False):
+        """
+        Predict the next pass of every satellite of the active catalogs
+        :param t0: time to start the search, use current time if omitted
+        :param duration: length of the search window in s
+        :param visible: visible = True will only keep the part of the passes where the satellite can be seen
+        :return: list of PassSummary
+        """
+        if t0 is None:
+            t0 = self.t()
+        tles = self.catalog_tle()
+        if visible and self.sun_table is None:
+            self.log(1, "Ephemeris not loaded yet: the invisible passes are not filtered")
+            visible = False
+        sun = partial(sun_itrf, self.sun_table, self.rotation) if visible else None
+        passes = batch_passes(tles, self.obs, self.ts, t0, duration, sun=sun, sun_max_alt=self.sun_max_alt)
+        self.log(2, "{0} passes found for {1} satellites", len(passes), len(tles))
+        return passes
+
+    def catalog_next_passes(self, t0=None, backward=False, progress=None, visible=False):
+        """
+        Predict the next pass of every satellite of the active catalogs with a pool of processes. The results are
+        identical to next_pass(), the computation can be stopped by self.pass_pool.cancel()
+        :param t0: time to start the search, use current time if omitted
+        :param backward: backward = True will search the previous pass
+        :param progress: optional function progress(done, total)
+        :param visible: visible = True will replace the passes during which the satellite cannot be seen by "no pass"
+        :return: generator of (name, satnum, pass) with pass in the next_pass() format
+        """
+        from passpool import PassPool  # multiprocessing is only imported when needed
+
+        if t0 is None:
+            t0 = self.t()
+        if self.sun_table is not None:
+            margin = (SEARCH_WINDOW + 2 * COARSE_STEP) / 86400.  # a pass in progress can start up to a window before t0
+            self.sun_table.fill(t0.tt - margin, t0.tt + margin)
+        elif visible:
+            self.log(1, "Ephemeris not loaded yet: the invisible passes are not filtered")
+            visible = False
+        self.pass_pool = PassPool(self.ts, self.obs, sun_table=self.sun_table)
+        return self.pass_pool.run(self.catalog_tle(), t0, backward, progress, self.sun_max_alt if visible else None)
 
     # INDI connection
     def connect(self):
@@ -609,17 +657,63 @@ class SatTrack(object):
             self.log(0, "Tracking cannot be started: no telescope connected")
             return
 
+        self.target_trajectory(self.t())  # computed before the first update of the telescope coordinates
+        self.speed_ra = 0.
+        self.speed_dec = 0.
+        self.controller_ra = None
+        self.controller_dec = None
+        self.update_controllers()
+        if self.trace_file:
+            try:
+                self.trace = TraceRecorder(self.trace_file)
+            except OSError as err:
+                self.log(1, "Tracking trace disabled: {0}", err)
+        if self.telemetry_dir:
+            if self.telemetry is None:
+                self.telemetry = TelemetryRecorder()
+            self.telemetry.reset(satellite=str(self.selected_satellite), satnum=self.sat.model.satnum,
+                                 controller=CONTROLLER_NAMES[self.track_method],
+                                 gains_ra=(self.controller_ra.p_gain, self.controller_ra.i_gain,
+                                           self.controller_ra.d_gain),
+                                 gains_dec=(self.controller_dec.p_gain, self.controller_dec.i_gain,
+                                            self.controller_dec.d_gain),
+                                 i_sat=self.i_sat, control_rate=self.control_rate,
+                                 latency_compensation=self.latency_compensation)
+            self.telemetry_start = self.t()
         self.tracking = True
+        if self.control_rate > 0:
+            self.control_loop = ControlLoop(self, self.control_rate)
+            if self.clock is None:  # with a simulated time, the loop is driven by the simulation
+                self.control_loop.start()
         if self.ui is not None:
             self.ui.tracking_started()
 
     def stop_tracking(self):
         if self.tracking:
             self.tracking = False
+            if self.control_loop is not None:
+                self.control_loop.stop()
+                self.control_loop = None
             self.indiclient.set_speed(0, 0)
+            if self.trace is not None:
+                trace, self.trace = self.trace, None
+                trace.close()
+                self.log(2, "{0} iterations of the tracking written in {1}", trace.records, trace.path)
+            if self.telemetry_start is not None:
+                self.telemetry.save(telemetry_path(self.telemetry_dir, self.selected_satellite, self.telemetry_start),
+                                    self.telemetry_saved)
+                self.telemetry_start = None
+            self.log(2, "Telescope round trip delay: {0:.3f} s", self.indiclient.latency.latency())
             if self.ui is not None:
                 self.ui.tracking_stopped()
 
+    def telemetry_saved(self, path, error):
+        # called by the telemetry recorder once the file is written
+        if error is None:
+            self.log(2, "Tracking telemetry saved in {0}", path)
+        else:
+            self.log(0, "Tracking telemetry not saved: {0}", error)
+
     def update_joystick_offset(self, nvp):
         # this procedure is called by indiclient each time the joystick input are updated.
         if self.joystick_mapping is None:
@@ -706,22 +800,58 @@ class SatTrack(object):
 
         self.t_offset_integration = t
 
+    def update_controllers(self):
+        """ Apply the controller configuration. The state of the controllers is kept if track_method is unchanged """
+        gains_ra = (self.p_gain, self.i_gain, self.d_gain)
+        gains_dec = (self.p_gain if self.p_gain_dec is None else self.p_gain_dec,
+                     self.i_gain if self.i_gain_dec is None else self.i_gain_dec,
+                     self.d_gain if self.d_gain_dec is None else self.d_gain_dec)
+        controllers = []
+        for controller, (p_gain, i_gain, d_gain) in ((self.controller_ra, gains_ra), (self.controller_dec, gains_dec)):
+            if type(controller) is not CONTROLLERS[self.track_method]:
+                controller = make_controller(self.track_method, p_gain, i_gain, d_gain, self.i_sat)
+            else:
+                controller.p_gain, controller.i_gain, controller.d_gain = p_gain, i_gain, d_gain
+                controller.i_sat = self.i_sat
+            controllers.append(controller)
+        self.controller_ra, self.controller_dec = controllers
+
+    def update_telescope_coord(self, current_ra, current_dec):
+        # This procedure is called by indiclient each time the telescope coordinates are updated, the control loop is
+        # read once as stop_tracking() can reset it from the GUI thread
+        control_loop = self.control_loop
+        if control_loop is not None:
+            control_loop.mount_report(current_ra, current_dec)
+        else:
+            self.update_tracking(current_ra, current_dec)
+
     # noinspection PyProtectedMember
     def update_tracking(self, current_ra, current_dec):
-        # This procedure is called each time the telescope coordinates are updated
+        # This procedure is called by the control loop, or each time the telescope coordinates are updated
         if not self.tracking:
             return
 
         # NOTE: all calculation are in deg
 
-        # target location and speed
-        target_ra, target_dec, alt = self.sat_pos()
-        target_ra_1, target_dec_1, alt = self.sat_pos(self.ts.tt(jd=self.t().tt + 1. / 86400.))  # at t + 1s
-        target_speed_ra = target_ra_1._degrees - target_ra._degrees
-        target_speed_dec = target_dec_1._degrees - target_dec._degrees
-
-        diff_ra = target_ra._degrees - current_ra * 15. + self.offset_ra
-        diff_dec = target_dec._degrees - current_dec + self.offset_dec
+        # latency compensation, see compensate()
+        latency = self.indiclient.latency.latency()
+        mount_ra, mount_dec = current_ra * 15., current_dec
+        current_ra, current_dec, lead = compensate(current_ra, current_dec, self.speed_ra, self.speed_dec,
+                                                   latency if self.latency_compensation else 0.)
+
+        # target location and speed interpolated in the precomputed trajectory
+        t_now = self.t().tt
+        t = self.ts.tt(jd=t_now + lead / 86400.)
+        trajectory = self.target_trajectory(t)
+        ra, dec, ra_rate, dec_rate = trajectory.radec(t)
+        ra_acc, dec_acc = trajectory.acceleration(t)
+        target_ra = ra * 180. / pi
+        target_dec = dec * 180. / pi
+        target_speed_ra = ra_rate * 180. / pi
+        target_speed_dec = dec_rate * 180. / pi
+
+        diff_ra = target_ra - current_ra * 15. + self.offset_ra
+        diff_dec = target_dec - current_dec + self.offset_dec
         if diff_ra > 180:
             diff_ra -= 360
         if diff_ra < -180:
@@ -731,25 +861,30 @@ class SatTrack(object):
         if diff_dec < -180:
             diff_dec += 360
 
-        speed_ra = self.p_gain * -diff_ra -target_speed_ra + self.offset_joystick_speed_ra + 360./86164.
-        speed_dec = self.p_gain * diff_dec + target_speed_dec + self.offset_joystick_speed_dec
+        # the RA speed command is relative to the sidereal rate and in the opposite direction
+        speed_ra = self.controller_ra.update(-diff_ra, -target_speed_ra, -ra_acc * 180. / pi, t_now * 86400.,
+                                             self.offset_joystick_speed_ra + 360. / 86164., abs(self.max_speed_ra))
+        speed_dec = self.controller_dec.update(diff_dec, target_speed_dec, dec_acc * 180. / pi, t_now * 86400.,
+                                               self.offset_joystick_speed_dec, abs(self.max_speed_de))
 
         self.log(3,
-                 "\ntime: {0}\ntarget:{1} / {2}\ncurrent: {3} / {4}\ndiff: {5} / {6}\ntarget speed: {7} / {8}\n"
-                 "command speed: {9} / {10}\noffset: {11} / {12}\noffset rate {13} / {14} ".format(
-                     self.t_iso(), target_ra, target_dec, Angle(hours=current_ra), Angle(degrees=current_dec),
-                     Angle(degrees=diff_ra), Angle(degrees=diff_dec), target_speed_ra, target_speed_dec, speed_ra,
-                     speed_dec, self.offset_ra, self.offset_dec, self.offset_joystick_speed_ra, self.offset_joystick_speed_dec))
-
-        # Clip to max speed
-        if speed_ra > abs(self.max_speed_ra):
-            speed_ra = abs(self.max_speed_ra)
-        if speed_dec > abs(self.max_speed_de):
-            speed_dec = abs(self.max_speed_de)
-        if speed_ra < -abs(self.max_speed_ra):
-            speed_ra = -abs(self.max_speed_ra)
-        if speed_dec < -abs(self.max_speed_de):
-            speed_dec = -abs(self.max_speed_de)
+                 "\ntime: {0:.8f}\ntarget: {1:.5f} / {2:.5f}\ncurrent: {3:.5f} / {4:.5f}\ndiff: {5:.5f} / {6:.5f}\n"
+                 "target speed: {7} / {8}\ncommand speed: {9} / {10}\noffset: {11} / {12}\noffset rate {13} / {14}\n"
+                 "lead: {15} s",
+                 t_now, target_ra, target_dec, current_ra * 15., current_dec, diff_ra, diff_dec,
+                 target_speed_ra, target_speed_dec, speed_ra, speed_dec, self.offset_ra, self.offset_dec,
+                 self.offset_joystick_speed_ra, self.offset_joystick_speed_dec, lead)
+        trace = self.trace
+        if trace is not None:
+            trace.record(t_now, lead, target_ra, target_dec, current_ra * 15., current_dec, diff_ra, diff_dec,
+                         target_speed_ra, target_speed_dec, speed_ra, speed_dec, self.offset_ra, self.offset_dec,
+                         self.offset_joystick_speed_ra, self.offset_joystick_speed_dec)
+        if self.telemetry_start is not None:
+            self.telemetry.record(t_now, target_ra, target_dec, mount_ra, mount_dec, diff_ra, diff_dec, speed_ra,
+                                  speed_dec, self.offset_ra, self.offset_dec, latency)
+
+        self.speed_ra = speed_ra
+        self.speed_dec = speed_dec
 
         # inverse direction if negative max speed
         if self.max_speed_ra < 0:
@@ -763,7 +898,7 @@ class SatTrack(object):
 
     def goto_altaz(self, alt: Angle, az: Angle):
         ra,dec=self.altaz2radec_2(alt,az)
-        self.log(2,"Goto alt/az {0} / {1}, ra/dec {2} / {3}".format(str(alt),str(az),str(ra),str(dec)))
+        self.log(2, "Goto alt/az {0} / {1}, ra/dec {2} / {3}", alt, az, ra, dec)
         self.indiclient.goto(ra,dec)
 
 
@@ -0,0 +1,128 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+from numpy import arange, arccos, arcsin, array, clip, einsum, floor, ndim, pi, sqrt, stack, unique, where
+from skyfield.constants import AU_KM
+
+from passsearch import local_frame
+
+EARTH_RADIUS = 6378.137  # km, spherical earth
+SUN_RADIUS = 696000.  # km
+SUN_STEP = 60.  # s, step of the table of the Sun positions
+SUN_CACHE = 10080  # maximal number of samples of the table (one week)
+SUN_MAX_ALT = -6.  # deg, the satellites are visible when the Sun is below this altitude (civil twilight)
+
+
+class SunTable(object):
+    """ Geocentric position of the Sun computed once per minute and linearly interpolated (error below 10 m) """
+
+    def __init__(self, ts, earth, sun, step=SUN_STEP):
+        """
+        :param ts: Skyfield Timescale
+        :param earth: Skyfield earth of the ephemeris
+        :param sun: Skyfield sun of the ephemeris
+        :param step: step of the table in s
+        """
+        self.ts = ts
+        self.vector = sun - earth
+        self.step = step / 86400.  # days
+        self.table = dict()  # grid index: Sun position in km (ICRF)
+
+    def __getstate__(self):
+        # the table is sent to the worker processes without the ephemeris, it must be filled beforehand
+        state = self.__dict__.copy()
+        state["vector"] = None
+        return state
+
+    def fill(self, t_start, t_end):
+        """ Compute the table between two TT julian dates """
+        self._samples(arange(int(floor(t_start / self.step)), int(floor(t_end / self.step)) + 2))
+
+    def _samples(self, k):
+        """ Sun positions (3, n) at the grid indexes k """
+        keys, inverse = unique(k, return_inverse=True)
+        missing = [i for i in keys.tolist() if i not in self.table]
+        if missing:
+            if len(self.table) + len(missing) > SUN_CACHE:
+                self.table.clear()
+                missing = keys.tolist()
+            position = self.vector.at(self.ts.tt(jd=array(missing) * self.step)).position.km.reshape(3, -1)
+            for j, i in enumerate(missing):
+                self.table[i] = position[:, j]
+        return stack([self.table[i] for i in keys.tolist()], axis=-1)[:, inverse]
+
+    def position(self, t):
+        """
+        Geocentric position of the Sun
+        :param t: Skyfield Time object, can contain an array of dates
+        :return: position in km (ICRF), of shape (3,) or (3, n) if t is an array
+        """
+        x = t.tt / self.step
+        k = floor(x)
+        w = (x - k).reshape(-1)
+        k = k.astype(int).reshape(-1)
+        position = self._samples(k) * (1. - w) + self._samples(k + 1) * w
+        return position[:, 0] if ndim(x) == 0 else position
+
+
+def sunlit_fraction(sat_position, sun_position):
+    """
+    Visible fraction of the solar disk seen from a satellite, conical shadow model of a spherical earth: 0 in the
+    umbra, between 0 and 1 in the penumbra, 1 when the satellite is illuminated
+    :param sat_position: geocentric position of the satellite in km, array of shape (3,) or (3, n)
+    :param sun_position: geocentric position of the Sun in km in the same frame
+    :return: fraction, float or array of shape (n)
+    """
+    sat_sun = sun_position - sat_position
+    sat_distance = sqrt(einsum("i...,i...->...", sat_position, sat_position))
+    sun_distance = sqrt(einsum("i...,i...->...", sat_sun, sat_sun))
+
+    # apparent radius of the Sun (a) and the earth (b) and separation of their centers (c) seen from the satellite
+    a = arcsin(SUN_RADIUS / sun_distance)
+    b = arcsin(clip(EARTH_RADIUS / sat_distance, -1., 1.))
+    c = arccos(clip(-einsum("i...,i...->...", sat_position, sat_sun) / (sat_distance * sun_distance), -1., 1.))
+
+    # area of the part of the solar disk hidden by the earth
+    x = (c * c + a * a - b * b) / (2. * c)
+    y = sqrt(clip(a * a - x * x, 0., None))
+    hidden = a * a * arccos(clip(x / a, -1., 1.)) + b * b * arccos(clip((c - x) / b, -1., 1.)) - c * y
+    fraction = 1. - hidden / (pi * a * a)
+    fraction = where(c >= a + b, 1., where(c <= b - a, 0., clip(fraction, 0., 1.)))
+    return fraction if ndim(fraction) else float(fraction)
+
+
+def illumination(sat, sun_table, rotation, t):
+    """
+    Visible fraction of the solar disk seen from a satellite, see sunlit_fraction()
+    :param sat: Skyfield EarthSatellite
+    :param sun_table: SunTable
+    :param rotation: RotationCache
+    :param t: Skyfield Time object, can contain an array of dates
+    :return: fraction, float or array
+    """
+    # computed in the terrestrial frame in which SGP4 positions are obtained without the nutation series
+    sat_position = sat.ITRF_position_velocity_error(t)[0] * AU_KM
+    return sunlit_fraction(sat_position, sun_itrf(sun_table, rotation, t))
+
+
+def sun_itrf(sun_table, rotation, t):
+    """
+    Geocentric position of the Sun in the terrestrial frame (ITRF)
+    :param sun_table: SunTable
+    :param rotation: RotationCache
+    :param t: Skyfield Time object, can contain an array of dates
+    :return: position in km, of shape (3,) or (3, n) if t is an array
+    """
+    return einsum("ij...,j...->i...", rotation.itrf_rotation(t), sun_table.position(t))
+
+
+def sun_altitude(obs, sun_position):
+    """
+    Altitude of the Sun seen by the observer, without refraction
+    :param obs: Skyfield Topos of the observer
+    :param sun_position: geocentric position of the Sun in km in the ITRF, array of shape (3,) or (3, n)
+    :return: altitude in rad, float or array of shape (n)
+    """
+    obs_itrf, rot = local_frame(obs)
+    xyz = einsum("ij,j...->i...", rot, (sun_position.T - obs_itrf * AU_KM).T)
+    return arcsin(xyz[2] / sqrt(einsum("i...,i...->...", xyz, xyz)))
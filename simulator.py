@@ -0,0 +1,223 @@
+"""
+Closed-loop tracking simulation without hardware
+
+Usage: python simulator.py [satellite] [output.csv]
+
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import sys
+from collections import deque
+
+from numpy import arange, array, column_stack, cos, degrees, empty, radians, savetxt, sqrt
+
+from latency import SIDEREAL_RATE, LatencyEstimator
+from passsearch import altaz
+
+SIMULATION_STEP = 0.01  # s, integration step of the mount
+SAMPLE_PERIOD = 0.1  # s, period of the tracking error time series
+TRUTH_CHUNK = 10000  # samples whose exact position is computed at once
+
+
+class SimulatedMount(object):
+    """ Simulated telescope mount, it can replace IndiClient in SatTrack
+
+    The speed commands are applied after half the round trip delay, with a limited speed and acceleration. The position
+    is reported periodically and received after half the round trip delay. The speed convention is the one of
+    IndiClient.set_speed(): the RA speed is relative to the sidereal rate and in the opposite direction of the RA.
+    """
+
+    def __init__(self, st, max_speed=2., max_acceleration=2., latency=0.2, report_period=1.):
+        """
+        :param st: SatTrack object that receives the position reports
+        :param max_speed: maximal speed of the axes in deg/s
+        :param max_acceleration: maximal acceleration of the axes in deg/s²
+        :param latency: round trip delay in s
+        :param report_period: period of the position reports in s
+        """
+        self.st = st
+        self.max_speed = max_speed
+        self.max_acceleration = max_acceleration
+        self.delay = latency
+        self.report_period = report_period
+        self.telescope_features = {
+            "minimal": True,
+            "move": False,
+            "timed": False,
+            "speed": True,
+            "pier": False,
+            "rate": False}
+        self.waiting_goto_end = False
+
+        self.now = 0.  # s, time of the simulation
+        self.latency = LatencyEstimator(clock=lambda: self.now)
+        self.ra = 0.  # h
+        self.dec = 0.  # deg
+        self.speed_ra = 0.  # current speed in deg/s
+        self.speed_dec = 0.
+        self.command_ra = 0.  # speed command applied by the mount
+        self.command_dec = 0.
+        self.commands = deque()  # (t, speed_ra, speed_dec) of the commands not yet received by the mount
+        self.acks = deque()  # (t, ra rate, dec rate) of the acknowledgements not yet received by the client, in arcsec/s
+        self.reports = deque()  # (t, ra, dec) of the reports not yet received by the client
+        self.next_report = 0.
+
+    def set_position(self, ra, dec):
+        """ Set the position of the mount: ra in h, dec in deg """
+        self.ra = ra % 24.
+        self.dec = dec
+
+    def set_speed(self, ra_speed: float, dec_speed: float):
+        """ send the command to change the speed of the telescope (in deg/s) """
+        ra_speed = min(max(ra_speed, -self.max_speed), self.max_speed)
+        dec_speed = min(max(dec_speed, -self.max_speed), self.max_speed)
+        self.commands.append((self.now + self.delay / 2., ra_speed, dec_speed))
+        # the rates are sent and echoed in arcsec/s as by IndiClient
+        self.acks.append((self.now + self.delay, ra_speed * 3600., dec_speed * 3600.))
+        self.latency.command_sent(ra_speed * 3600., dec_speed * 3600.)
+
+    def goto(self, ra, dec):
+        """ goto to given coordinates, the slew is instantaneous """
+        self.set_position(ra._hours, dec._degrees)
+
+    def telescope_ready(self):
+        return True
+
+    def isServerConnected(self):
+        return True
+
+    def advance(self, t):
+        """ Simulate the mount until t (s) and deliver the messages received by the client """
+        self.deliver()
+        while self.now < t - 1e-9:
+            dt = min(SIMULATION_STEP, t - self.now)
+            self.now += dt
+
+            while self.commands and self.commands[0][0] <= self.now:
+                self.command_ra, self.command_dec = self.commands.popleft()[1:]
+            dv = self.max_acceleration * dt
+            self.speed_ra += min(max(self.command_ra - self.speed_ra, -dv), dv)
+            self.speed_dec += min(max(self.command_dec - self.speed_dec, -dv), dv)
+            self.ra = (self.ra + dt * (SIDEREAL_RATE - self.speed_ra) / 15.) % 24.
+            self.dec += dt * self.speed_dec
+
+            if self.now >= self.next_report:
+                self.reports.append((self.now + self.delay / 2., self.ra, self.dec))
+                self.next_report += self.report_period
+            self.deliver()
+
+    def deliver(self):
+        """ Deliver the acknowledgements and the position reports that have reached the client """
+        while self.reports and self.reports[0][0] <= self.now + 1e-9:
+            self.st.update_telescope_coord(*self.reports.popleft()[1:])
+        while self.acks and self.acks[0][0] <= self.now + 1e-9:
+            self.latency.ack_received(*self.acks.popleft()[1:])
+
+
+class SimulationResult(object):
+    """ Tracking error time series, in arcsec on the sky """
+
+    def __init__(self, t, ra_error, dec_error):
+        self.t = t  # s from the start of the simulation
+        self.ra_error = ra_error
+        self.dec_error = dec_error
+        self.error = sqrt(ra_error ** 2 + dec_error ** 2)
+
+    def rms(self, settle=0.):
+        """ RMS error in arcsec, ignoring the first 'settle' seconds """
+        error = self.error[self.t >= settle]
+        return sqrt((error ** 2).mean()) if len(error) else 0.
+
+    def peak(self, settle=0.):
+        """ Peak error in arcsec, ignoring the first 'settle' seconds """
+        error = self.error[self.t >= settle]
+        return error.max() if len(error) else 0.
+
+    def save(self, path):
+        savetxt(path, column_stack((self.t, self.ra_error, self.dec_error, self.error)), delimiter=",",
+                header="t (s),RA error (arcsec),DEC error (arcsec),error (arcsec)", comments="")
+
+
+def simulate(st, mount, t_start, duration, initial_offset=(0., 0.), telemetry_dir=None):
+    """
+    Run the tracking of the selected satellite against a simulated mount faster than real time
+    :param st: SatTrack object, its clock, telescope and telemetry directory are replaced during the simulation
+    :param mount: SimulatedMount
+    :param t_start: Skyfield Time object, start of the tracking
+    :param duration: length of the simulation in s
+    :param initial_offset: initial error of the mount in RA (h) and DEC (deg)
+    :param telemetry_dir: directory where the telemetry of the simulated pass is saved, not saved if omitted
+    :return: SimulationResult
+    """
+    clock, indiclient, directory = st.clock, st.indiclient, st.telemetry_dir
+    st.clock = lambda: t_start.tt + mount.now / 86400.
+    st.indiclient = mount
+    st.telemetry_dir = telemetry_dir
+    samples = []
+    try:
+        ra, dec, distance = st.sat_pos()
+        mount.set_position(ra.hours + initial_offset[0], dec.degrees + initial_offset[1])
+        st.start_tracking()
+        next_tick = 0.
+        for t in arange(0., duration + SAMPLE_PERIOD / 2, SAMPLE_PERIOD):
+            # the control loop iterations are done at their exact time
+            while st.control_loop is not None and next_tick <= t:
+                mount.advance(next_tick)
+                st.control_loop.iterate()
+                next_tick += st.control_loop.period
+            mount.advance(t)
+            samples.append((t, mount.ra, mount.dec))
+        st.stop_tracking()
+        if st.telemetry is not None:
+            st.telemetry.join()
+    finally:
+        st.clock, st.indiclient, st.telemetry_dir = clock, indiclient, directory
+
+    # exact target position, computed by chunks to limit the memory used by the long passes
+    t, ra, dec = array(samples).T
+    target_ra = empty(len(t))
+    target_dec = empty(len(t))
+    for i in range(0, len(t), TRUTH_CHUNK):
+        chunk = st.ts.tt(jd=t_start.tt + t[i:i + TRUTH_CHUNK] / 86400.)
+        target = (st.sat - st.obs).at(chunk).radec()
+        target_ra[i:i + TRUTH_CHUNK], target_dec[i:i + TRUTH_CHUNK] = target[0].hours, target[1].degrees
+    ra_error = ((target_ra - ra + 12.) % 24. - 12.) * 15. * cos(radians(target_dec)) * 3600.
+    dec_error = (target_dec - dec) * 3600.
+    return SimulationResult(t, ra_error, dec_error)
+
+
+def simulate_pass(st, mount, t0=None, min_alt=10., telemetry_dir=None):
+    """
+    Simulate the tracking of the next pass of the selected satellite, from the time it reaches min_alt (deg)
+    :param telemetry_dir: directory where the telemetry of the simulated pass is saved, not saved if omitted
+    :return: SimulationResult, None if no pass is found
+    """
+    if t0 is None:
+        t0 = st.t()
+    t_events, alt_events, az_events = st.next_pass(t0)[:3]
+    if t_events[1] is None or alt_events[1].degrees < min_alt:
+        return None
+    t_start = t_events[0] if t_events[0] is not None else t0
+    t_end = t_events[3] if t_events[3] is not None else t_events[1]
+
+    # only the part of the pass above min_alt is tracked
+    t = arange(0, (t_end.tt - t_start.tt) * 86400., 1.)
+    alt = altaz(st.sat, st.obs, st.ts.tt(jd=t_start.tt + t / 86400.))[0]
+    above = t[degrees(alt) >= min_alt]
+    return simulate(st, mount, st.ts.tt(jd=t_start.tt + above[0] / 86400.), above[-1] - above[0],
+                    telemetry_dir=telemetry_dir)
+
+
+if __name__ == "__main__":
+    from sattrack import SatTrack
+
+    st = SatTrack()
+    if len(sys.argv) > 1:
+        st.selected_satellite = sys.argv[1]
+    result = simulate_pass(st, SimulatedMount(st))
+    if result is None:
+        print("No pass of {0} higher than 10 deg".format(st.selected_satellite))
+    else:
+        print("{0}: RMS error {1:.1f} arcsec, peak error {2:.1f} arcsec after 10 s".format(
+            st.selected_satellite, result.rms(10.), result.peak(10.)))
+        if len(sys.argv) > 2:
+            result.save(sys.argv[2])
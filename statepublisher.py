@@ -0,0 +1,118 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import threading
+import time
+
+from skyfield.units import Angle
+
+from sattrack import Error
+
+STATE_RATE = 1.  # Hz, default rate of the state displayed by the UI
+
+
+class State(object):
+    """ Snapshot of the satellite and telescope state, all the values are computed at the same date """
+
+    def __init__(self, t):
+        self.t = t  # Skyfield Time
+        self.sat_ra = None  # Skyfield Angle, None if no satellite is selected
+        self.sat_dec = None
+        self.sat_alt = None
+        self.sat_az = None
+        self.sat_distance = None  # km
+        self.sat_in_shadow = None  # None if the ephemeris is not loaded
+        self.tel_ra = None  # Skyfield Angle, None if the telescope coordinates are not available
+        self.tel_dec = None
+        self.tel_alt = None
+        self.tel_az = None
+        self.diff_ra = None  # telescope - satellite, Skyfield Angle
+        self.diff_dec = None
+        self.offset_ra = None  # Skyfield Angle
+        self.offset_dec = None
+
+
+class StatePublisher(object):
+    """ Compute the state displayed by the UI at a fixed rate in a dedicated thread
+
+    The propagation of the satellite and the conversions are done outside the GUI thread: publish() is called from the
+    publisher thread with each new State, the UI forwards it to the GUI thread with a Qt signal and only renders it.
+    """
+
+    def __init__(self, st, publish, rate=STATE_RATE):
+        """
+        :param st: SatTrack object
+        :param publish: function publish(state) called from the publisher thread
+        :param rate: update rate in Hz
+        """
+        self.st = st
+        self.publish = publish
+        self.period = 1. / rate
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name="state publisher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """ Stop the publisher and wait for the end of the current update """
+        self.stop_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def set_rate(self, rate):
+        """ Change the update rate in Hz, applied from the next update """
+        self.period = 1. / rate
+
+    def snapshot(self):
+        """
+        Compute the current state
+        :return: State, None if the timescale is not loaded yet
+        """
+        st = self.st
+        if st.ts is None:
+            return None
+        t = st.t()
+        state = State(t)
+        state.offset_ra = Angle(degrees=st.offset_ra)
+        state.offset_dec = Angle(degrees=st.offset_dec)
+
+        sat = st.sat
+        if sat is not None:
+            state.sat_ra, state.sat_dec, distance = st.sat_pos(t)
+            state.sat_distance = distance.km
+            state.sat_alt, state.sat_az = st.radec2altaz_2(state.sat_ra, state.sat_dec, t)
+            if st.sun_table is not None:
+                state.sat_in_shadow = bool(st.in_shadow(t))
+
+        try:
+            state.tel_ra, state.tel_dec = st.telescope_pos()
+        except Error:  # no telescope
+            return state
+        state.tel_alt, state.tel_az = st.radec2altaz_2(state.tel_ra, state.tel_dec, t)
+        if sat is not None:
+            state.diff_ra = Angle(degrees=state.tel_ra._degrees - state.sat_ra._degrees)
+            state.diff_dec = Angle(degrees=state.tel_dec._degrees - state.sat_dec._degrees)
+        return state
+
+    def _run(self):
+        next_time = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                state = self.snapshot()
+            except Exception as err:  # e.g. satellite changed during the update
+                self.st.log(1, "State update failed: " + str(err))
+                state = None
+            if state is not None:
+                self.publish(state)
+
+            # keep the schedule, skip the updates that can no longer be done on time
+            next_time = max(next_time + self.period, time.monotonic())
+            if self.stop_event.wait(next_time - time.monotonic()):
+                break
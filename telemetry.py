@@ -0,0 +1,147 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import os
+import re
+import threading
+
+from numpy import arange, array, cos, empty, hypot, load, radians, savez_compressed, sqrt
+
+TELEMETRY_CAPACITY = 72000  # number of control steps kept per pass, 2 hours at 10 Hz
+TELEMETRY_DIR = "telemetry"  # directory of the files of the passes
+
+# recorded values of each control step, the angles and speeds are in deg and deg/s, see SatTrack.update_tracking()
+TELEMETRY_FIELDS = ("t",  # TT julian date
+                    "target_ra", "target_dec",
+                    "mount_ra", "mount_dec",  # last coordinates reported by the telescope
+                    "error_ra", "error_dec",  # target - telescope, with the offsets and the latency compensation
+                    "speed_ra", "speed_dec",  # commanded speed, RA relative to the sidereal rate
+                    "offset_ra", "offset_dec",
+                    "latency")  # s, round trip delay of the telescope
+
+
+class TelemetryRecorder(object):
+    """ Record of the control steps of a pass in preallocated ring buffers
+
+    record() only stores the values in the buffers, once the buffers are full the oldest steps are overwritten. save()
+    copies the steps of the pass and writes them to a compressed .npz file in a background thread.
+    """
+
+    def __init__(self, capacity=TELEMETRY_CAPACITY):
+        """
+        :param capacity: maximal number of steps kept
+        """
+        self.capacity = capacity
+        self.buffers = {name: empty(capacity) for name in TELEMETRY_FIELDS}
+        self.columns = [self.buffers[name] for name in TELEMETRY_FIELDS]
+        self.count = 0  # number of steps recorded since the last reset, including the overwritten ones
+        self.metadata = dict()
+        self.threads = []
+
+    def reset(self, **metadata):
+        """
+        Start the record of a new pass
+        :param metadata: values saved with the pass, e.g. the satellite and the controller parameters
+        """
+        self.count = 0
+        self.metadata = metadata
+
+    def record(self, *values):
+        """ Store a control step, the values in the order of TELEMETRY_FIELDS """
+        i = self.count % self.capacity
+        for column, value in zip(self.columns, values):
+            column[i] = value
+        self.count += 1
+
+    def steps(self):
+        """
+        Steps of the pass kept in the buffers, oldest first
+        :return: dict of numpy arrays, one per name of TELEMETRY_FIELDS
+        """
+        if self.count <= self.capacity:
+            return {name: buffer[:self.count].copy() for name, buffer in self.buffers.items()}
+        order = (arange(self.capacity) + self.count) % self.capacity
+        return {name: buffer[order] for name, buffer in self.buffers.items()}
+
+    def save(self, path, done=None):
+        """
+        Write the steps and the metadata of the pass to a compressed .npz file in a background thread
+        :param path: path of the file, its directory is created if needed
+        :param done: optional function done(path, error) called from the background thread, error is None on success
+        """
+        arrays = self.steps()
+        for key, value in self.metadata.items():
+            arrays[key] = array(value)
+        if self.count > self.capacity:
+            arrays["dropped"] = array(self.count - self.capacity)
+
+        def write():
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                savez_compressed(path, **arrays)
+            except OSError as err:
+                if done is not None:
+                    done(path, err)
+            else:
+                if done is not None:
+                    done(path, None)
+
+        self.threads = [thread for thread in self.threads if thread.is_alive()]
+        thread = threading.Thread(target=write, name="telemetry", daemon=True)
+        thread.start()
+        self.threads.append(thread)
+
+    def join(self):
+        """ Wait for the end of the writes in progress """
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+def telemetry_path(directory, satellite, t):
+    """
+    Path of the telemetry file of a pass
+    :param directory: telemetry directory
+    :param satellite: name of the satellite
+    :param t: Skyfield Time object, start of the tracking
+    :return: e.g. "telemetry/ISS_ZARYA_20200101T000000Z.npz", with a number appended if the file already exists
+    """
+    name = "{0}_{1}".format(re.sub(r"[^0-9A-Za-z-]+", "_", str(satellite)).strip("_") or "satellite",
+                            t.utc_strftime("%Y%m%dT%H%M%SZ"))
+    path = os.path.join(directory, name + ".npz")
+    i = 1
+    while os.path.exists(path):
+        i += 1
+        path = os.path.join(directory, "{0}_{1}.npz".format(name, i))
+    return path
+
+
+def load_telemetry(path):
+    """
+    Read the telemetry of a pass saved by TelemetryRecorder
+    :param path: path of the .npz file
+    :return: dict of numpy arrays, the fields of TELEMETRY_FIELDS and the metadata
+    """
+    with load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def compare_telemetry(paths, skip=10.):
+    """
+    Tracking error of several passes, e.g. to compare controller versions
+    :param paths: list of .npz files
+    :param skip: duration in s ignored at the start of each pass, during the acquisition
+    :return: list of (path, RMS error, peak error) in arcsec, the RA error being scaled by cos(dec)
+    """
+    result = []
+    for path in paths:
+        data = load_telemetry(path)
+        kept = (data["t"] - data["t"][0]) * 86400. >= skip if len(data["t"]) else array([], dtype=bool)
+        error = hypot(data["error_ra"] * cos(radians(data["target_dec"])), data["error_dec"])[kept] * 3600.
+        if len(error):
+            result.append((path, float(sqrt((error * error).mean())), float(error.max())))
+        else:
+            result.append((path, None, None))
+    return result
@@ -0,0 +1,138 @@
+"""
+Merge of the catalogs by SatelliteCatalog
+
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from elementstore import ElementStore, SatelliteCatalog
+
+LINE1 = "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927"
+LINE2 = "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537"
+DAY = 264.  # day of the year of the epoch 0 of the tests, in 2008
+JD = 2454729.5  # UTC julian date of DAY
+
+
+class SatelliteCatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.files = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def store(self, *satellites):
+        """ ElementStore of the satellites (NORAD number, name, epoch in days from JD), in the Celestrak format """
+        self.files += 1
+        path = os.path.join(self.directory, "{0}.txt".format(self.files))
+        with open(path, "w") as f:
+            for satnum, name, epoch in satellites:
+                f.write("{0}\n{1}\n{2}\n".format(name.ljust(24), LINE1[:2] + "{0:05d}".format(satnum) + LINE1[7:20] +
+                                                 "{0:012.8f}".format(DAY + epoch) + LINE1[32:],
+                                                 LINE2[:2] + "{0:05d}".format(satnum) + LINE2[7:]))
+        return ElementStore.parse(path)
+
+    def assertEpoch(self, catalog, key, epoch):
+        self.assertAlmostEqual(catalog.record(key).epoch, JD + epoch, 6)
+        self.assertEqual(catalog[key].model.jdsatepoch + catalog[key].model.jdsatepochF, catalog.record(key).epoch)
+
+    def test_add(self):
+        catalog = SatelliteCatalog()
+        self.assertEqual(catalog.add(self.store((1, "SAT 1", 2.), (2, "SAT 2", 1.)), "A"), 2)
+        self.assertEqual(catalog.add(self.store((1, "SAT 1", 3.), (3, "SAT 3", 1.)), "B"), 2)
+        self.assertEqual(sorted(catalog.satellite_keys()), ["SAT 1", "SAT 2", "SAT 3"])
+        self.assertEqual(len(catalog.tles()), 3)
+        self.assertEpoch(catalog, "SAT 1", 3.)
+        self.assertEpoch(catalog, 1, 3.)
+        self.assertEqual(catalog.record(1).catalogs, ("A", "B"))
+        self.assertEqual(catalog["SAT 2"].model.satnum, 2)
+        self.assertNotIn("SAT 4", catalog)
+
+    def test_add_older(self):
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 3.)), "A")
+        catalog.add(self.store((1, "SAT 1", 2.)), "B")
+        self.assertEpoch(catalog, 1, 3.)
+        self.assertIs(catalog.record(1).store, catalog.stores["A"])
+
+    def test_readd_unchanged(self):
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 2.), (2, "SAT 2", 1.)), "A")
+        store = self.store((1, "SAT 1", 2.), (2, "SAT 2", 1.))
+        self.assertEqual(catalog.add(store, "A"), 0)
+        self.assertEqual(catalog.add(store, "A"), 0)
+        self.assertIs(catalog.record(1).store, store)  # the previous store can be released
+        self.assertIs(catalog.record(2).store, store)
+
+    def test_refresh(self):
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 2.), (2, "SAT 2", 1.)), "A")
+        self.assertEqual(catalog.add(self.store((1, "SAT 1", 4.), (2, "SAT 2", 1.)), "A"), 1)
+        self.assertEpoch(catalog, 1, 4.)
+        self.assertEpoch(catalog, 2, 1.)
+
+    def test_refresh_older(self):
+        # the elements of B are replaced by older ones than the elements of A
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 2.)), "A")
+        catalog.add(self.store((1, "SAT 1", 3.)), "B")
+        catalog.add(self.store((1, "SAT 1", 1.)), "B")
+        self.assertEpoch(catalog, 1, 2.)
+        self.assertIs(catalog.record(1).store, catalog.stores["A"])
+        catalog.add(self.store((1, "SAT 1", 0.)), "A")
+        self.assertEpoch(catalog, 1, 1.)
+        self.assertIs(catalog.record(1).store, catalog.stores["B"])
+
+    def test_refresh_without_satellite(self):
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 3.), (2, "SAT 2", 1.)), "A")
+        catalog.add(self.store((1, "SAT 1", 2.)), "B")
+        catalog.add(self.store((2, "SAT 2", 1.)), "A")
+        self.assertEpoch(catalog, 1, 2.)
+        self.assertEqual(catalog.record(1).catalogs, ("B",))
+        catalog.add(self.store((1, "SAT 1", 2.)), "A")
+        self.assertNotIn(2, catalog)
+        self.assertNotIn("SAT 2", catalog)
+
+    def test_remove(self):
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 2.), (2, "SAT 2", 1.)), "A")
+        catalog.add(self.store((1, "SAT 1", 3.), (3, "SAT 3", 1.)), "B")
+        catalog.remove("B")
+        self.assertEpoch(catalog, 1, 2.)
+        self.assertEqual(catalog.record(1).catalogs, ("A",))
+        self.assertNotIn(3, catalog)
+        self.assertNotIn("SAT 3", catalog)
+        catalog.remove("A")
+        self.assertEqual(len(catalog), 0)
+        self.assertEqual(catalog.stores, {})
+
+    def test_rename(self):
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "SAT 1", 2.)), "A")
+        catalog.add(self.store((1, "NEW NAME", 3.)), "A")
+        self.assertNotIn("SAT 1", catalog)
+        self.assertEqual(catalog.record("NEW NAME"), catalog.record(1))
+        self.assertEqual(catalog["NEW NAME"].name, "NEW NAME")
+
+    def test_rename_by_other_catalog(self):
+        # the name follows the most recent elements when a catalog is refreshed or removed
+        catalog = SatelliteCatalog()
+        catalog.add(self.store((1, "OLD NAME", 2.)), "A")
+        catalog.add(self.store((1, "NEW NAME", 3.)), "B")
+        self.assertEqual(catalog.satellite_keys(), ["NEW NAME"])
+        self.assertNotIn("OLD NAME", catalog)
+        catalog.remove("B")
+        self.assertEqual(catalog.satellite_keys(), ["OLD NAME"])
+        self.assertNotIn("NEW NAME", catalog)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,272 @@
+"""
+Refresh of the TLE catalogs by SatTrack.load_catalog() and SatTrack.update_tle() against a local HTTP server
+
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogmanifest import CatalogManifest
+from sattrack import CatalogItem, SatTrack, load
+
+# elements of the test catalogs, catalog() changes their number and their epoch
+TLE_LINES = ("ISS (ZARYA)",
+             "1 25544U 98067A   08264.51782528 -.00002182  00000-0 -11606-4 0  2927",
+             "2 25544  51.6416 247.4627 0006703 130.5360 325.0288 15.72125391563537")
+EPOCH = 2454730.0178  # UTC julian date of the elements of TLE_LINES
+
+
+def catalog(*days):
+    """ Text of a catalog of TLE_LINES with the epoch day of the year of each satellite """
+    text = ""
+    for i, day in enumerate(days):
+        line1 = TLE_LINES[1][:2] + "{0:05d}".format(25544 + i) + TLE_LINES[1][7:20] + "{0:012.8f}".format(day) + \
+            TLE_LINES[1][32:]
+        line2 = TLE_LINES[2][:2] + "{0:05d}".format(25544 + i) + TLE_LINES[2][7:]
+        text += "{0} {1}\n{2}\n{3}\n".format(TLE_LINES[0], i, line1, line2)
+    return text.encode()
+
+
+class CatalogHandler(BaseHTTPRequestHandler):
+    """ Catalog server answering 304 to the requests with the current ETag """
+
+    def do_GET(self):
+        server = self.server
+        server.requests.append(dict(self.headers, path=self.path))
+        time.sleep(server.delays.get(self.path, 0.))
+        data = server.data.get(self.path)
+        if server.status != 200 or data is None:
+            self.send_error(server.status if data is not None else 404)
+        elif self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header("ETag", server.etag)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class CatalogServerTest(unittest.TestCase):
+    """ SatTrack in a temporary directory with a local catalog server """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ts = load.timescale()
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), CatalogHandler)
+        self.server.requests = []
+        self.server.status = 200
+        self.server.etag = '"1"'
+        self.server.data = {"/test.txt": catalog(264.51782528)}  # path: catalog
+        self.server.delays = {}  # path: delay of the answer in s
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)  # the catalogs are saved in the current directory by load.path_to()
+        self.catalog = self.catalog_item("test")
+        self.st = SatTrack(wait=False)
+        self.st.log_sink.console_level = -1
+        self.st.ts = self.ts
+        self.now = EPOCH + 1.
+        self.st.clock = lambda: self.now
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def catalog_item(self, name):
+        return CatalogItem(name, "http://127.0.0.1:{0}/{1}.txt".format(self.server.server_port, name), True)
+
+    def expire(self, name="test"):
+        """ Make the last request of a catalog old enough to be repeated """
+        manifest = CatalogManifest.load(load.path_to(name + ".txt"))
+        manifest.fetched = 0.
+        manifest.save()
+
+
+class LoadCatalogTest(CatalogServerTest):
+
+    def test_download(self):
+        store = self.st.load_catalog(self.catalog)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertNotIn("If-None-Match", self.server.requests[0])
+        manifest = CatalogManifest.load(load.path_to("test.txt"))
+        self.assertEqual(manifest.etag, '"1"')
+        self.assertAlmostEqual(manifest.epoch_median, EPOCH, 3)
+
+    def test_fresh(self):
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        self.assertEqual(len(self.st.load_catalog(self.catalog)), 1)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_not_modified(self):
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        self.now = EPOCH + 10.
+        store = self.st.load_catalog(self.catalog)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.requests[1]["If-None-Match"], '"1"')
+        self.assertLess(CatalogManifest.load(load.path_to("test.txt")).age(), 60.)
+
+    def test_modified(self):
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        self.now = EPOCH + 10.
+        self.server.etag = '"2"'
+        self.server.data["/test.txt"] = catalog(264.51782528, 274.51782528)
+        self.assertEqual(len(self.st.load_catalog(self.catalog)), 2)
+        self.assertEqual(CatalogManifest.load(load.path_to("test.txt")).etag, '"2"')
+
+    def test_invalid_file(self):
+        # a 304 answer would leave the empty file: the catalog is requested without the ETag
+        self.st.load_catalog(self.catalog)
+        with open(load.path_to("test.txt"), "w"):
+            pass
+        store = self.st.load_catalog(self.catalog)
+        self.assertEqual(len(store), 1)
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertNotIn("If-None-Match", self.server.requests[1])
+
+    def test_changed_file(self):
+        # the statistics of the manifest are not used for another file with as many satellites
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        with open(load.path_to("test.txt"), "wb") as f:
+            f.write(catalog(254.51782528))
+        self.st.load_catalog(self.catalog)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_invalid_download(self):
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        self.now = EPOCH + 10.
+        self.server.etag = '"2"'
+        self.server.data["/test.txt"] = b"<html>Service unavailable</html>"
+        store = self.st.load_catalog(self.catalog)
+        self.assertEqual(len(store), 1)  # the previous file is kept
+        self.assertEqual(len(self.st.load_catalog(self.catalog)), 1)
+        self.assertEqual(CatalogManifest.load(load.path_to("test.txt")).etag, '"1"')
+
+    def test_median_epoch(self):
+        # a few recent elements do not make an old catalog fresh
+        self.server.data["/test.txt"] = catalog(254.51782528, 254.51782528, 264.51782528)
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        self.assertEqual(len(self.server.requests), 1)
+        self.st.load_catalog(self.catalog)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_failed_download(self):
+        self.st.load_catalog(self.catalog)
+        self.expire()
+        self.now = EPOCH + 10.
+        self.server.status = 500
+        store = self.st.load_catalog(self.catalog)
+        self.assertEqual(len(store), 1)  # the previous elements are kept
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(CatalogManifest.load(load.path_to("test.txt")).fetched, 0.)
+
+    def test_failed_first_download(self):
+        self.server.status = 404
+        self.assertIsNone(self.st.load_catalog(self.catalog))
+        self.assertFalse(os.path.exists(load.path_to("test.txt")))
+
+
+class CatalogListener(object):
+    """ Stand-in of the UI notified by SatTrack.merge_catalog() """
+
+    def __init__(self):
+        self.loaded = []
+
+    def catalog_loaded(self, catalog):
+        self.loaded.append(catalog.name)
+
+
+class UpdateTleTest(CatalogServerTest):
+
+    def setUp(self):
+        super(UpdateTleTest, self).setUp()
+        # the same satellite, more recent in "a", and a satellite only in "a"
+        self.server.data = {"/a.txt": catalog(266.51782528, 266.51782528), "/b.txt": catalog(265.51782528)}
+        self.st.catalogs = [self.catalog_item("a"), self.catalog_item("b")]
+        self.st._selected_satellite = 25544
+        self.listener = CatalogListener()
+        self.st.set_ui(self.listener)
+
+    def epoch(self, satnum):
+        return self.st.satellites_tle.record(satnum).epoch
+
+    def test_update(self):
+        self.st.update_tle(wait=True)
+        self.assertEqual(sorted(self.listener.loaded), ["a", "b"])
+        self.assertEqual(self.st.tle_pending, 0)
+        self.assertEqual(sorted(self.st.satellites_tle.stores), ["a", "b"])
+        self.assertEqual(sorted(self.st.satellites_tle.records), [25544, 25545])
+        self.assertAlmostEqual(self.epoch(25544), EPOCH + 2., 3)
+        self.assertEqual(self.st.sat.model.satnum, 25544)
+
+        # "b" is outdated and has more recent elements on the server, "a" is still fresh and only read from the disk
+        self.now = EPOCH + 5.
+        self.server.etag = '"2"'
+        self.server.data["/b.txt"] = catalog(268.51782528)
+        self.expire("a")
+        self.expire("b")
+        self.st.update_tle(max_age=3.5, wait=True)
+        self.assertEqual(sorted(self.listener.loaded), ["a", "a", "b", "b"])
+        self.assertEqual(self.st.tle_pending, 0)
+        self.assertEqual([request["path"] for request in self.server.requests[2:]], ["/b.txt"])
+        self.assertAlmostEqual(self.epoch(25544), EPOCH + 4., 3)
+        self.assertAlmostEqual(self.epoch(25545), EPOCH + 2., 3)
+        self.assertAlmostEqual(self.st.sat.model.jdsatepoch + self.st.sat.model.jdsatepochF, EPOCH + 4., 3)
+
+    def test_superseded_update(self):
+        # "b" is still loading when a new update without it starts: its elements are ignored
+        merged = threading.Event()
+        merge_catalog = self.st.merge_catalog
+
+        def merge_and_notify(generation, catalog_item, future):
+            merge_catalog(generation, catalog_item, future)
+            if catalog_item.name == "b":
+                merged.set()
+
+        self.st.merge_catalog = merge_and_notify
+        self.server.delays["/b.txt"] = 0.5
+        self.st.update_tle()
+        self.st.catalogs[1].active = False
+        self.st.update_tle(wait=True)
+        self.assertTrue(merged.wait(10.))
+        self.assertEqual(self.st.tle_pending, 0)
+        self.assertEqual(list(self.st.satellites_tle.stores), ["a"])
+        self.assertEqual(self.st.satellites_tle.record(25544).catalogs, ("a",))
+        self.assertEqual(self.listener.loaded.count("b"), 0)
+
+    def test_failed_update(self):
+        self.server.status = 500
+        self.st.update_tle(wait=True)
+        self.assertEqual(sorted(self.listener.loaded), ["a", "b"])
+        self.assertEqual(self.st.tle_pending, 0)
+        self.assertEqual(len(self.st.satellites_tle), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import struct
+import threading
+
+from numpy import dtype, fromfile
+
+# fields of a record of the tracking loop, the angles and speeds are in deg and deg/s, see SatTrack.update_tracking()
+TRACE_FIELDS = ("t",  # TT julian date
+                "lead",  # s, anticipation of the target by the latency compensation
+                "target_ra", "target_dec",
+                "current_ra", "current_dec",  # telescope position extrapolated to the application of the command
+                "diff_ra", "diff_dec",  # target - telescope, with the offsets
+                "target_speed_ra", "target_speed_dec",
+                "speed_ra", "speed_dec",  # commanded speed, RA relative to the sidereal rate
+                "offset_ra", "offset_dec",
+                "offset_speed_ra", "offset_speed_dec")
+TRACE_RECORD = struct.Struct("<{0}d".format(len(TRACE_FIELDS)))
+TRACE_DTYPE = dtype([(name, "<f8") for name in TRACE_FIELDS])
+TRACE_BUFFER = 65536  # bytes, size of the write buffer of the file
+
+
+class TraceRecorder(object):
+    """ Binary trace of the tracking loop
+
+    Each iteration is appended as a fixed size record of little endian doubles without any formatting. The file is only
+    written when its buffer is full: recording at 10 Hz costs a few µs per iteration. The trace is read by read_trace().
+
+    The tracking may be stopped from the GUI thread while the INDI thread records an iteration: the records after the
+    closure are ignored.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: path of the trace file, overwritten if it exists
+        """
+        self.path = path
+        self.file = open(path, "wb", buffering=TRACE_BUFFER)
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def record(self, *values):
+        """ Append a record, the values in the order of TRACE_FIELDS """
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(TRACE_RECORD.pack(*values))
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_trace(path):
+    """
+    Read a trace written by TraceRecorder
+    :param path: path of the trace file
+    :return: numpy structured array with one field per name of TRACE_FIELDS, e.g. trace["diff_ra"]
+    """
+    return fromfile(path, dtype=TRACE_DTYPE)
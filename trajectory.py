@@ -0,0 +1,92 @@
+"""
+Author: Romain Fafet (farom57@gmail.com)
+"""
+from numpy import arange, arcsin, arctan2, einsum, floor, pi, sqrt, unwrap
+
+TRAJECTORY_STEP = 1.  # s, interpolation error below 0.1 arcsec for a LEO close to the zenith
+TRAJECTORY_DURATION = 1200.  # s, the table is recomputed when the time leaves it
+TRAJECTORY_MARGIN = 10.  # s, the table starts a bit before the current time
+TRAJECTORY_PREFETCH = 300.  # s, the next table is computed in background when the time gets this close to the end
+
+
+class Trajectory(object):
+    """ Topocentric ra, dec of a satellite precomputed on a time grid
+
+    The positions and velocities are computed once for the whole table with a single vectorized call, the ra, dec and
+    their rates are then obtained by cubic Hermite interpolation, which only costs a few floating point operations.
+    The results are the same as SatTrack.sat_pos() but the rates are analytic instead of finite differences.
+    """
+
+    def __init__(self, sat, obs, ts, t_start, duration=TRAJECTORY_DURATION, step=TRAJECTORY_STEP):
+        """
+        :param sat: Skyfield EarthSatellite
+        :param obs: Skyfield Topos of the observer
+        :param ts: Skyfield Timescale
+        :param t_start: Skyfield Time object, start of the table
+        :param duration: length of the table in s
+        :param step: time step of the table in s
+        """
+        self.sat = sat
+        self.obs = obs
+        self.step = step
+        self.t_start = t_start.tt
+        self.t_end = self.t_start + duration / 86400.
+
+        dt = arange(0, duration + step, step)
+        topocentric = (sat - obs).at(ts.tt(jd=self.t_start + dt / 86400.))
+        x, y, z = topocentric.position.au
+        vx, vy, vz = topocentric.velocity.au_per_d / 86400.  # au/s
+        rho2 = x * x + y * y
+        r2 = rho2 + z * z
+
+        self.ra = unwrap(arctan2(y, x))  # continuous to be interpolated
+        self.dec = arcsin(z / sqrt(r2))
+        self.ra_rate = (x * vy - y * vx) / rho2  # rad/s
+        self.dec_rate = (vz * r2 - z * einsum("i...,i...->...", (x, y, z), (vx, vy, vz))) / (r2 * sqrt(rho2))
+
+    def covers(self, t):
+        """ True if the Skyfield Time t is inside the table """
+        return self.t_start <= t.tt <= self.t_end
+
+    def radec(self, t):
+        """
+        Interpolated ra, dec and rates
+        :param t: Skyfield Time object inside the table
+        :return: ra, dec in rad, ra_rate, dec_rate in rad/s
+        """
+        i, s = self._locate(t)
+        ra, ra_rate = _hermite(self.ra[i], self.ra[i + 1], self.ra_rate[i], self.ra_rate[i + 1], s, self.step)[:2]
+        dec, dec_rate = _hermite(self.dec[i], self.dec[i + 1], self.dec_rate[i], self.dec_rate[i + 1], s, self.step)[:2]
+        return ra % (2 * pi), dec, ra_rate, dec_rate
+
+    def acceleration(self, t):
+        """
+        Interpolated acceleration
+        :param t: Skyfield Time object inside the table
+        :return: ra_acceleration, dec_acceleration in rad/s²
+        """
+        i, s = self._locate(t)
+        ra = _hermite(self.ra[i], self.ra[i + 1], self.ra_rate[i], self.ra_rate[i + 1], s, self.step)[2]
+        dec = _hermite(self.dec[i], self.dec[i + 1], self.dec_rate[i], self.dec_rate[i + 1], s, self.step)[2]
+        return ra, dec
+
+    def _locate(self, t):
+        """ Index of the interval containing t and position inside the interval in [0, 1] """
+        x = (t.tt - self.t_start) * 86400. / self.step
+        i = min(int(floor(x)), len(self.ra) - 2)
+        return i, x - i
+
+
+def _hermite(p0, p1, m0, m1, s, h):
+    """
+    Cubic Hermite interpolation at s in [0, 1] between p0 and p1 of slopes m0, m1, h is the step
+    :return: value, first and second derivatives
+    """
+    m0 *= h
+    m1 *= h
+    s2 = s * s
+    s3 = s2 * s
+    value = (2 * s3 - 3 * s2 + 1) * p0 + (s3 - 2 * s2 + s) * m0 + (-2 * s3 + 3 * s2) * p1 + (s3 - s2) * m1
+    slope = (6 * s2 - 6 * s) * p0 + (3 * s2 - 4 * s + 1) * m0 + (-6 * s2 + 6 * s) * p1 + (3 * s2 - 2 * s) * m1
+    curvature = (12 * s - 6) * p0 + (6 * s - 4) * m0 + (-12 * s + 6) * p1 + (6 * s - 2) * m1
+    return value, slope / h, curvature / (h * h)
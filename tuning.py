@@ -0,0 +1,144 @@
+"""
+Tuning of the tracking parameters by simulation of the passes of the catalog
+
+Usage: python tuning.py [number of passes]
+
+Author: Romain Fafet (farom57@gmail.com)
+"""
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from os import cpu_count
+
+from numpy import linspace, radians, sqrt
+from skyfield.api import EarthSatellite
+
+from logsink import LogSink
+from passtable import batch_passes
+from simulator import SimulatedMount, simulate_pass
+
+TUNING_GRID = {
+    "track_method": [0, 1, 3],
+    "p_gain": [0.25, 0.5, 1., 2.],
+    "control_rate": [0., 5.]}
+TUNING_SETTLE = 10.  # s, the convergence after the start of the tracking is not taken into account
+TUNING_MIN_ALT = 20.  # deg, minimal elevation of the passes used for the tuning
+TUNING_MAX_DURATION = 1200.  # s, only the fast passes (LEO) are used, they are the most difficult to track
+
+# state of the worker processes, set by _init_worker()
+_st = None
+
+
+def _init_worker(st):
+    # the simulations of the workers do not write any file: no telemetry, no trace and no log file
+    global _st
+    _st = st
+    _st.telemetry_dir = None
+    _st.trace_file = None
+    _st.log_sink = LogSink(None)
+    _st.log_sink.console_level = 1  # only the warnings and the errors of the simulations are printed
+
+
+def _simulate(config, tle, t0, mount):
+    """ Simulate a pass with a configuration in a worker process, return its RMS and peak error in arcsec """
+    for key, value in config.items():
+        setattr(_st, key, value)
+    _st.sat = EarthSatellite(tle[1], tle[2], tle[0])
+    _st._selected_satellite = tle[0]
+    result = simulate_pass(_st, SimulatedMount(_st, **mount), _st.ts.tt(jd=t0), TUNING_MIN_ALT)
+    if result is None:
+        return None
+    return result.rms(TUNING_SETTLE), result.peak(TUNING_SETTLE)
+
+
+def _catalog_number(field):
+    """ NORAD number of the 5 characters of a TLE line as decoded by sgp4, including the Alpha-5 numbers: the first
+    letter, without I and O, counts from 10, e.g. A0000 is 100000 and Z9999 is 339999 """
+    letter = field[0].upper()
+    if letter.isalpha():
+        return (ord(letter) - ord("A") + 10 - (letter > "I") - (letter > "O")) * 10000 + int(field[1:])
+    return int(field)
+
+
+class TuningResult(object):
+    """ Tracking error of a configuration over all the simulated passes """
+
+    def __init__(self, config, rms, peak, passes):
+        self.config = config  # dict of SatTrack attributes
+        self.rms = rms  # arcsec, RMS over all the passes
+        self.peak = peak  # arcsec, worst error over all the passes
+        self.passes = passes  # number of passes simulated
+
+    def __str__(self):
+        return "{0}: RMS {1:.1f} arcsec, peak {2:.1f} arcsec".format(
+            ", ".join("{0}={1}".format(key, value) for key, value in self.config.items()), self.rms, self.peak)
+
+
+def select_passes(st, n_passes, t0=None, duration=86400):
+    """
+    Passes of the catalog used for the tuning, spread from the lowest to the highest elevation
+    :return: list of ((name, line1, line2), t0) with t0 the TT julian date to start the search of the pass
+    """
+    if t0 is None:
+        t0 = st.t()
+    tles = {_catalog_number(tle[1][2:7]): tle for tle in st.catalog_tle()}
+    passes = [p for p in batch_passes(list(tles.values()), st.obs, st.ts, t0, duration, radians(TUNING_MIN_ALT))
+              if p.t_rise is not None and p.t_set is not None and p.duration() <= TUNING_MAX_DURATION]
+    passes.sort(key=lambda p: p.alt_max)
+    if len(passes) > n_passes:
+        passes = [passes[int(i)] for i in linspace(0, len(passes) - 1, n_passes)]
+    return [(tles[p.satnum], p.t_rise.tt - 60. / 86400.) for p in passes]
+
+
+def tune(st, grid=None, n_passes=8, t0=None, mount=None, workers=None, progress=None):
+    """
+    Simulate the tracking of several passes of the catalog for each combination of the parameters of the grid. The
+    simulations are run in a pool of processes with a copy of st, the tuned values can be applied directly to st.
+
+    :param st: SatTrack object, its configuration is used for the parameters that are not in the grid
+    :param grid: dict of SatTrack attribute: list of values, TUNING_GRID if omitted
+    :param n_passes: number of passes simulated for each configuration
+    :param t0: Skyfield Time object, start of the search of the passes, use current time if omitted
+    :param mount: dict of SimulatedMount parameters (max_speed, max_acceleration, latency, report_period)
+    :param workers: number of processes, number of CPU if omitted
+    :param progress: optional function progress(done, total)
+    :return: list of TuningResult sorted from the best to the worst RMS error
+    """
+    grid = TUNING_GRID if grid is None else grid
+    mount = {} if mount is None else mount
+    passes = select_passes(st, n_passes, t0)
+    configs = [dict(zip(grid.keys(), values)) for values in product(*grid.values())]
+    st.log(2, "Tuning: {0} configurations, {1} passes", len(configs), len(passes))
+
+    # the workers are spawned rather than forked: a fork would copy the locks and the threads of st in their state
+    with ProcessPoolExecutor(workers if workers is not None else cpu_count(),
+                             mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker,
+                             initargs=(st,)) as executor:
+        futures = [[executor.submit(_simulate, config, tle, pass_t0, mount) for tle, pass_t0 in passes]
+                   for config in configs]
+        results = []
+        done = 0
+        for config, config_futures in zip(configs, futures):
+            errors = []
+            for future in config_futures:
+                error = future.result()
+                if error is not None:
+                    errors.append(error)
+                done += 1
+                if progress is not None:
+                    progress(done, len(configs) * len(passes))
+            if errors:
+                rms = sqrt(sum(e[0] ** 2 for e in errors) / len(errors))
+                results.append(TuningResult(config, rms, max(e[1] for e in errors), len(errors)))
+
+    results.sort(key=lambda r: r.rms)
+    return results
+
+
+if __name__ == "__main__":
+    from sattrack import SatTrack
+
+    st = SatTrack()
+    for result in tune(st, n_passes=int(sys.argv[1]) if len(sys.argv) > 1 else 8):
+        print(result)
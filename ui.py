@@ -1,14 +1,20 @@
 """
 Author: Romain Fafet (farom57@gmail.com)
 """
+import threading
 
 from PyQt5 import QtCore, QtWidgets
 from skyfield.units import Angle
 
 from catalogdialog import Ui_Catalogdialog
 from joystickdialog import Ui_Joystickdialog
+from logsink import LOG_CAPACITY, LOG_FILE, LOG_FLUSH_PERIOD, format_html
 from mainwindow import Ui_MainWindow
-from sattrack import Error, SatTrack
+from passtable import PassSummary
+from passtabledialog import Ui_Passtabledialog
+from satellitemodel import SatelliteIndex, SatelliteListModel
+from sattrack import SatTrack
+from statepublisher import StatePublisher
 from timedialog import Ui_Timedialog
 from tledialog import Ui_Tledialog
 
@@ -16,6 +22,10 @@ from tledialog import Ui_Tledialog
 class UI(QtWidgets.QMainWindow, Ui_MainWindow):
     """ User interface of pySatTrack """
 
+    catalog_loaded_signal = QtCore.pyqtSignal(object)  # emitted from the TLE update threads
+    loading_signal = QtCore.pyqtSignal(str)  # emitted from the loading thread at each step, empty text once loaded
+    state_signal = QtCore.pyqtSignal(object)  # emitted from the state publisher thread
+
     def __init__(self, st):
         super(UI, self).__init__()
         self.st = st  # type: SatTrack
@@ -28,6 +38,7 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.cat_dg = None
         self.tle_dg = None
         self.joy_dg = None
+        self.pass_dg = None
 
         # Load dynamic content
         self.host_edit.setText(self.st.indi_server_ip)
@@ -36,15 +47,26 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.p_gain_spinbox.setValue(self.st.p_gain)
         self.max_speed_RA_spinbox.setValue(self.st.max_speed_ra)
         self.max_speed_DE_spinbox.setValue(self.st.max_speed_de)
+        self.control_rate_spinbox.setValue(self.st.control_rate)
+        self.controller_combobox.setCurrentIndex(self.st.track_method)
+        self.i_gain_spinbox.setValue(self.st.i_gain)
+        self.d_gain_spinbox.setValue(self.st.d_gain)
         self.update_speed()
         self.latitude_edit.setText(self.st.observer_lat)
         self.longitude_edit.setText(self.st.observer_lon)
         self.altitude_spinbox.setValue(self.st.observer_alt)
+        self.display_rate_spinbox.setValue(self.st.display_rate)
 
+        self.sat_model = SatelliteListModel(self)
+        self.sat_combobox.setModel(self.sat_model)
+        self.sat_combobox.view().setUniformItemSizes(True)  # the size of the items of the popup is not computed
+        self.enable_satellite_changed = True
         self.update_sat_list()
 
-        self.current_pass = self.st.next_pass(self.st.t())
-        self.update_pass()
+        self.current_pass = None
+        if self.st.sat is not None:
+            self.current_pass = self.st.next_pass(self.st.t())
+            self.update_pass()
 
         self.update_speed()
 
@@ -58,6 +80,10 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.max_speed_RA_spinbox.valueChanged['double'].connect(self.trackparam_changed)
         self.max_speed_DE_spinbox.valueChanged['double'].connect(self.trackparam_changed)
         self.joystick_speed_spinbox.valueChanged['double'].connect(self.trackparam_changed)
+        self.control_rate_spinbox.valueChanged['double'].connect(self.trackparam_changed)
+        self.controller_combobox.currentIndexChanged['int'].connect(self.trackparam_changed)
+        self.i_gain_spinbox.valueChanged['double'].connect(self.trackparam_changed)
+        self.d_gain_spinbox.valueChanged['double'].connect(self.trackparam_changed)
         self.joystick_btn.clicked.connect(self.joystickconfig_clicked)
 
         self.center_btn.clicked.connect(self.track_clicked)
@@ -84,28 +110,61 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.longitude_edit.textChanged.connect(self.location_changed)
         self.altitude_spinbox.valueChanged['int'].connect(self.location_changed)
 
+        self.display_rate_spinbox.valueChanged['double'].connect(self.display_rate_changed)
         self.real_time_btn.toggled['bool'].connect(self.timemode_changed)
         self.set_time_btn.clicked.connect(self.settime_clicked)
 
         self.catalog_sat_btn.toggled['bool'].connect(self.satmode_changed)
         self.sat_combobox.currentIndexChanged['QString'].connect(self.satellite_changed)
-        self.enable_satellite_changed = True
+        self.sat_search_edit.textChanged.connect(self.satellite_search_changed)
+        self.sat_search_edit.returnPressed.connect(self.satellite_search_validated)
+        self.sat_catalog_combobox.currentIndexChanged['int'].connect(self.satellite_search_changed)
+        self.sat_orbit_combobox.currentIndexChanged['int'].connect(self.satellite_search_changed)
         self.catalog_config_btn.clicked.connect(self.catconfig_clicked)
         self.set_TLE_btn.clicked.connect(self.tleconfig_clicked)
 
         self.prev_pass_btn.clicked.connect(self.prevpass_clicked)
         self.next_pass_btn.clicked.connect(self.nextpass_clicked)
+        self.pass_table_btn.clicked.connect(self.passtable_clicked)
+        self.catalog_loaded_signal.connect(self.update_catalog)
+        self.loading_signal.connect(self.update_loading)
+        self.state_signal.connect(self.show_state)
         self.goto_rise_btn.clicked.connect(self.gotorise_clicked)
         self.goto_meridian_btn.clicked.connect(self.gotomeridian_clicked)
 
         # Additional slot connection to grey out widget depending on optionbox
         self.real_time_btn.toggled['bool'].connect(self.set_time_btn.setDisabled)
         self.catalog_sat_btn.toggled['bool'].connect(self.sat_combobox.setEnabled)
+        self.catalog_sat_btn.toggled['bool'].connect(self.sat_search_edit.setEnabled)
+        self.catalog_sat_btn.toggled['bool'].connect(self.sat_catalog_combobox.setEnabled)
+        self.catalog_sat_btn.toggled['bool'].connect(self.sat_orbit_combobox.setEnabled)
         self.catalog_sat_btn.toggled['bool'].connect(self.catalog_config_btn.setEnabled)
         self.catalog_sat_btn.toggled['bool'].connect(self.set_TLE_btn.setDisabled)
 
-        # timer to update the time:
-        self.startTimer(1000)
+        # the timescale, the catalogs and the ephemeris are loaded in background, the window is shown meanwhile
+        self.loading_bar = QtWidgets.QProgressBar()
+        self.loading_bar.setMaximumWidth(200)
+        self.statusbar.addPermanentWidget(self.loading_bar)
+        self.loading_bar.hide()
+        self.pass_box.setEnabled(self.current_pass is not None)
+        self.tracking_box.setEnabled(self.current_pass is not None)
+        if self.st.ts is None:
+            self.central_widget.setEnabled(False)
+            self.loading_bar.setMaximum(2 + len([catalog for catalog in self.st.catalogs if catalog.active]))
+            self.loading_bar.setValue(0)
+            self.loading_bar.show()
+            threading.Thread(target=self.load_data, daemon=True).start()
+
+        # the satellite and telescope state is computed in background and shown by show_state()
+        self.state_publisher = StatePublisher(self.st, self.state_signal.emit, self.st.display_rate)
+        self.state_publisher.start()
+
+        # the log messages are queued by SatTrack from any thread and shown by batch, the oldest lines are removed
+        self.st.log_sink.open(LOG_FILE)  # only the GUI keeps a log file
+        self.log_browser.document().setMaximumBlockCount(LOG_CAPACITY)
+        self.log_timer = QtCore.QTimer(self)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(int(LOG_FLUSH_PERIOD * 1000))
 
     # Buttons
     def connect_clicked(self):
@@ -142,7 +201,7 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         if self.current_pass[0][3] is not None:
             starting = self.current_pass[0][3]  # set date of the current pass
         else:
-            starting = self.st.ts.tt(jd=self.current_pass[0][5] + 1)  # +24h if no current pass
+            starting = self.st.ts.tt(jd=self.current_pass[0][4] + 1)  # +24h if no current pass
         self.current_pass = self.st.next_pass(starting, backward=False)
         self.update_pass()  # update display
 
@@ -150,10 +209,14 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         if self.current_pass[0][0] is not None:
             starting = self.current_pass[0][0]  # rise date of the current pass
         else:
-            starting = self.st.ts.tt(jd=self.current_pass[0][5] - 1)  # -24h if no current pass
+            starting = self.st.ts.tt(jd=self.current_pass[0][4] - 1)  # -24h if no current pass
         self.current_pass = self.st.next_pass(starting, backward=True)
         self.update_pass()  # update display
 
+    def passtable_clicked(self):
+        self.pass_dg = Passtabledialog(self)
+        self.pass_dg.show_modal()
+
     def gotorise_clicked(self):
         assert self.current_pass[0][0] is not None
         self.st.stop_tracking()
@@ -216,6 +279,10 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.st.indi_server_ip = self.host_edit.text()
         self.st.indi_port = self.port_edit.value()
 
+    def display_rate_changed(self, rate):
+        self.st.display_rate = rate
+        self.state_publisher.set_rate(rate)
+
     def timemode_changed(self, realtime):
         if realtime:
             self.st.observer_offset = 0
@@ -233,7 +300,11 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
             self.st.selected_satellite = name
             age = self.st.t() - self.st.sat.epoch
             self.sat_lbl.setText('Valid elements, ' + '{:.2f} days old'.format(age))
-            self.st.log(1, 'Satellite changed: ' + name)
+            try:
+                catalogs = ', '.join(self.st.satellites_tle.record(self.st.selected_satellite).catalogs)
+            except KeyError:  # custom TLE
+                catalogs = ''
+            self.st.log(1, 'Satellite changed: ' + name + (' (' + catalogs + ')' if catalogs else ''))
             self.current_pass = self.st.next_pass(self.st.t())
             self.update_pass()
 
@@ -251,6 +322,12 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.st.max_speed_de = self.max_speed_DE_spinbox.value()
         self.st.joystick_speed = self.joystick_speed_spinbox.value()
         self.st.p_gain = self.p_gain_spinbox.value()
+        self.st.control_rate = self.control_rate_spinbox.value()  # used at the next start of the tracking
+        self.st.track_method = self.controller_combobox.currentIndex()
+        self.st.i_gain = self.i_gain_spinbox.value()
+        self.st.d_gain = self.d_gain_spinbox.value()
+        if self.st.tracking:
+            self.st.update_controllers()
 
     # System callbacks
     def connected(self):
@@ -303,33 +380,130 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
         self.joystick_btn.setText("Configure")
         self.joystick_btn.blockSignals(False)
 
-    def update_sat_list(self):
-        """ when satellite list shall be updated"""
+    def catalog_loaded(self, catalog):
+        """ when a catalog is loaded, called from the TLE update threads """
+        self.catalog_loaded_signal.emit(catalog)
+
+    def update_catalog(self, catalog):
+        self.update_sat_list()
+        if self.st.sat is not None and not self.pass_box.isEnabled():  # first satellite available after the startup
+            if self.current_pass is None:
+                self.current_pass = self.st.next_pass(self.st.t())
+                self.update_pass()
+            self.pass_box.setEnabled(True)
+            self.tracking_box.setEnabled(True)
+        if self.loading_bar.isVisible():
+            self.step_loading()
+        if self.st.tle_pending == 0:
+            self.st.log(2, "Catalogs loaded: {0} satellites", len(self.st.satellites_tle.records))
+
+    def load_data(self):
+        """ Loading thread started at the startup """
+        try:
+            self.st.load_data(wait=False, progress=self.loading_signal.emit)
+        except Exception as err:
+            self.loading_signal.emit("Loading error: " + str(err))
+        else:
+            self.loading_signal.emit("")
+
+    def update_loading(self, text):
+        """ Show the loading steps in the status bar """
+        if self.st.ts is not None and not self.central_widget.isEnabled():  # timescale loaded
+            self.central_widget.setEnabled(True)
+            self.step_loading()
+        if text.startswith("Loading error"):
+            self.st.log(0, text)
+            self.statusbar.showMessage(text)
+            self.loading_bar.hide()
+        elif text:
+            self.statusbar.showMessage(text + "...")
+        else:
+            self.statusbar.showMessage("Ephemeris loaded", 5000)
+            self.step_loading()
+            if self.current_pass is not None:
+                self.current_pass = self.st.next_pass(self.st.t())  # with the shadow entry and exit
+                self.update_pass()
 
-        # build & sort key list
-        keys = []
-        selected_satellite_idx = -1
-        for key in self.st.satellites_tle:
-            keys.append(str(key))
-        keys.sort()
+    def step_loading(self):
+        self.loading_bar.setValue(self.loading_bar.value() + 1)
+        if self.loading_bar.value() >= self.loading_bar.maximum():
+            self.loading_bar.hide()
+
+    def update_sat_list(self):
+        """ when satellite list shall be updated: only the satellites that have changed are inserted in or removed from
+        the combo box """
+        with self.st.tle_lock:
+            index = SatelliteIndex(self.st.satellites_tle)
+            catalogs = sorted(self.st.satellites_tle.stores)
+
+        # the catalog filter lists the loaded catalogs
+        catalog = self.sat_catalog_combobox.currentText()
+        self.sat_catalog_combobox.blockSignals(True)
+        self.sat_catalog_combobox.clear()
+        self.sat_catalog_combobox.addItem("All catalogs")
+        self.sat_catalog_combobox.addItems(catalogs)
+        self.sat_catalog_combobox.setCurrentIndex(max(self.sat_catalog_combobox.findText(catalog), 0))
+        self.sat_catalog_combobox.blockSignals(False)
 
-        # update the combobox items, also memorise the index of selected satellite
         self.enable_satellite_changed = False
-        self.sat_combobox.clear()
-        i = 0
-        for key in keys:
-            self.sat_combobox.addItem(str(key))
-            if key == self.st.selected_satellite:
-                selected_satellite_idx = i
-            i = i + 1
+        self.sat_model.catalog = self.sat_catalog_combobox.currentText() \
+            if self.sat_catalog_combobox.currentIndex() > 0 else None
+        self.sat_model.set_index(index)
         self.enable_satellite_changed = True
 
-        # define current item, modify the selected satellite if it has been remove from the list
-        if selected_satellite_idx >= 0:
-            self.sat_combobox.setCurrentIndex(selected_satellite_idx)
+        # modify the selected satellite if it has been removed from the catalogs once all the catalogs are loaded
+        if str(self.st.selected_satellite) not in index.rows and len(index) and self.st.tle_pending == 0:
+            self.satellite_search_clear()
+            self.sat_combobox.setCurrentIndex(0)
+            self.satellite_changed(self.sat_model.key(0))
         else:
+            self.show_selected_satellite()
+
+    def show_selected_satellite(self):
+        """ Show the selected satellite in the combo box, nothing if it is hidden by the search """
+        self.enable_satellite_changed = False
+        self.sat_combobox.setCurrentIndex(self.sat_model.find(self.st.selected_satellite))
+        self.enable_satellite_changed = True
+
+    def select_satellite(self, key):
+        """
+        Select a satellite of the catalogs, the search is cleared if it hides the satellite
+        :param key: name or NORAD number
+        :return: False if the satellite is not in the catalogs
+        """
+        if self.sat_model.find(key) < 0 and str(key) in self.sat_model.satellites.rows:
+            self.satellite_search_clear()
+        row = self.sat_model.find(key)
+        if row >= 0:
+            self.sat_combobox.setCurrentIndex(row)
+        return row >= 0
+
+    def satellite_search_changed(self, *args):
+        self.enable_satellite_changed = False
+        self.sat_model.set_search(self.sat_search_edit.text(),
+                                  self.sat_catalog_combobox.currentText()
+                                  if self.sat_catalog_combobox.currentIndex() > 0 else None,
+                                  self.sat_orbit_combobox.currentText()
+                                  if self.sat_orbit_combobox.currentIndex() > 0 else None)
+        self.enable_satellite_changed = True
+        self.show_selected_satellite()
+
+    def satellite_search_validated(self):
+        """ Enter pressed in the search field: select the best match """
+        if self.sat_model.rowCount() > 0:
             self.sat_combobox.setCurrentIndex(0)
-            self.satellite_changed(keys[0])
+
+    def satellite_search_clear(self):
+        for widget in (self.sat_search_edit, self.sat_catalog_combobox, self.sat_orbit_combobox):
+            widget.blockSignals(True)
+        self.sat_search_edit.clear()
+        self.sat_catalog_combobox.setCurrentIndex(0)
+        self.sat_orbit_combobox.setCurrentIndex(0)
+        for widget in (self.sat_search_edit, self.sat_catalog_combobox, self.sat_orbit_combobox):
+            widget.blockSignals(False)
+        self.enable_satellite_changed = False
+        self.sat_model.set_search()
+        self.enable_satellite_changed = True
 
     def update_pass(self):
         if self.current_pass[0][0] is not None:
@@ -368,49 +542,70 @@ class UI(QtWidgets.QMainWindow, Ui_MainWindow):
             self.set_time_lbl.setText("-")
             self.set_az_lbl.setText("-")
 
+        shadow_entry, shadow_exit = self.current_pass[3]
+        if self.st.sun_table is None:  # ephemeris not loaded yet
+            self.shadow_entry_lbl.setText("-")
+            self.shadow_exit_lbl.setText("-")
+        elif shadow_entry is None and shadow_exit is None and self.current_pass[0][1] is not None:
+            # no shadow boundary crossed during the pass
+            text = "Whole pass" if self.st.in_shadow(self.current_pass[0][1]) else "Never"
+            self.shadow_entry_lbl.setText(text)
+            self.shadow_exit_lbl.setText(text)
+        else:
+            self.shadow_entry_lbl.setText(shadow_entry.utc_iso() if shadow_entry is not None else "-")
+            self.shadow_exit_lbl.setText(shadow_exit.utc_iso() if shadow_exit is not None else "-")
+
     def update_telescope_speed(self,ra, de):
         self.max_speed_RA_spinbox.setValue(ra)
         self.max_speed_DE_spinbox.setValue(de)
 
-    # Update information panel every second time, sat location telescope location...)
-    def timerEvent(self, event):
+    # Update information panel (time, sat location telescope location...) with the state computed in background
+    def show_state(self, state):
 
         # Time
-        self.time_lbl.setText(self.st.t_iso())
+        self.time_lbl.setText(state.t.utc_iso())
 
         # Satellite
-        sat_ra, sat_dec, sat_distance = self.st.sat_pos()
-        sat_alt, sat_az = self.st.radec2altaz_2(sat_ra, sat_dec)
-        self.sat_ra_lbl.setText(sat_ra.hstr())
-        self.sat_dec_lbl.setText(sat_dec.dstr())
-        self.sat_alt_lbl.setText(sat_alt.dstr())
-        self.sat_az_lbl.setText(sat_az.dstr())
-        self.sat_dist_lbl.setText("{0:8.0f}km".format(sat_distance.km))
-        self.sat_shadow_lbl.setText(str(self.st.in_shadow()))
+        if state.sat_ra is not None:
+            self.sat_ra_lbl.setText(state.sat_ra.hstr())
+            self.sat_dec_lbl.setText(state.sat_dec.dstr())
+            self.sat_alt_lbl.setText(state.sat_alt.dstr())
+            self.sat_az_lbl.setText(state.sat_az.dstr())
+            self.sat_dist_lbl.setText("{0:8.0f}km".format(state.sat_distance))
+            self.sat_shadow_lbl.setText(str(state.sat_in_shadow) if state.sat_in_shadow is not None else "-")
 
         # Telescope
-        try:
-            tel_ra, tel_dec = self.st.telescope_pos()
-            tel_alt, tel_az = self.st.radec2altaz_2(tel_ra, tel_dec)
-            diff_ra = Angle(degrees=tel_ra._degrees - sat_ra._degrees)
-            diff_dec = Angle(degrees=tel_dec._degrees - sat_dec._degrees)
-        except Error:
+        if state.tel_ra is None:
             self.tel_ra_lbl.setText("-")
             self.tel_dec_lbl.setText("-")
             self.tel_alt_lbl.setText("-")
             self.tel_az_lbl.setText("-")
-            self.diff_ra_lbl.setText("-")
-            self.diff_dec_lbl.setText("-")
         else:
-            self.tel_ra_lbl.setText(tel_ra.hstr())
-            self.tel_dec_lbl.setText(tel_dec.dstr())
-            self.tel_alt_lbl.setText(tel_alt.dstr())
-            self.tel_az_lbl.setText(tel_az.dstr())
-            self.diff_ra_lbl.setText(diff_ra.dstr())
-            self.diff_dec_lbl.setText(diff_dec.dstr())
-
-        self.offset_ra_lbl.setText(Angle(degrees=self.st.offset_ra).dstr())
-        self.offset_dec_lbl.setText(Angle(degrees=self.st.offset_dec).dstr())
+            self.tel_ra_lbl.setText(state.tel_ra.hstr())
+            self.tel_dec_lbl.setText(state.tel_dec.dstr())
+            self.tel_alt_lbl.setText(state.tel_alt.dstr())
+            self.tel_az_lbl.setText(state.tel_az.dstr())
+        self.diff_ra_lbl.setText(state.diff_ra.dstr() if state.diff_ra is not None else "-")
+        self.diff_dec_lbl.setText(state.diff_dec.dstr() if state.diff_dec is not None else "-")
+
+        self.offset_ra_lbl.setText(state.offset_ra.dstr())
+        self.offset_dec_lbl.setText(state.offset_dec.dstr())
+
+    def flush_log(self):
+        """ Show the messages logged since the last flush, by default the debug messages are not shown """
+        log_sink = self.st.log_sink
+        lines = [format_html(record) for record in log_sink.flush() if record[0] <= log_sink.ui_level]
+        if lines:
+            self.log_browser.setUpdatesEnabled(False)
+            for line in lines[-LOG_CAPACITY:]:
+                self.log_browser.append(line)
+            self.log_browser.setUpdatesEnabled(True)
+
+    def closeEvent(self, event):
+        self.state_publisher.stop()
+        self.log_timer.stop()
+        self.st.log_sink.close()
+        super(UI, self).closeEvent(event)
 
 
 class Timedialog(QtWidgets.QDialog, Ui_Timedialog):
@@ -534,6 +729,111 @@ class Joystickdialog(QtWidgets.QDialog, Ui_Joystickdialog):
         self.st.joystick_expo = self.expo_spinbox.value()
 
 
+class Passtabledialog(QtWidgets.QDialog, Ui_Passtabledialog):
+    """ Dialog showing the next pass of every satellite of the active catalogs """
+
+    progress_signal = QtCore.pyqtSignal(int, int)  # emitted from the pass computation thread after each chunk
+    passes_signal = QtCore.pyqtSignal(object)  # emitted from the pass computation thread with all the passes
+
+    def __init__(self, ui):
+        super(Passtabledialog, self).__init__()
+        self.ui = ui
+        self.st = ui.st
+
+        self.running = False
+        self.t0 = None
+        self.duration = None
+
+        # UI setup
+        self.setupUi(self)
+        self.compute_btn.clicked.connect(self.compute)
+        self.pass_table.cellDoubleClicked.connect(self.select_satellite)
+        self.progress_signal.connect(self.update_progress)
+        self.passes_signal.connect(self.passes_computed)
+
+    def compute(self):
+        """ Called when Compute button pressed """
+        if self.running:
+            self.st.pass_pool.cancel()
+            return
+
+        self.t0 = self.st.t()
+        self.duration = self.duration_spinbox.value() * 3600
+        visible = self.visible_checkbox.isChecked()
+        self.running = True
+        if self.exact_checkbox.isChecked():
+            # the passes are computed by the process pool, its results are collected in a thread
+            self.compute_btn.setText("Cancel")
+            generator = self.st.catalog_next_passes(self.t0, progress=self.progress_signal.emit, visible=visible)
+            threading.Thread(target=self.collect_passes, args=(generator,), daemon=True).start()
+        else:
+            self.compute_btn.setEnabled(False)  # the batch computation cannot be cancelled
+            threading.Thread(target=self.batch_passes, args=(visible,), daemon=True).start()
+
+    def batch_passes(self, visible):
+        """ Thread computing SatTrack.catalog_passes(), the passes are sent by passes_signal """
+        passes = []
+        try:
+            passes = self.st.catalog_passes(self.t0, self.duration, visible)
+        except Exception as err:
+            self.st.log(0, "Pass computation failed: {0}", err)
+        finally:
+            self.progress_signal.emit(1, 1)
+            self.passes_signal.emit(passes)
+
+    def collect_passes(self, generator):
+        """ Thread consuming the results of SatTrack.catalog_next_passes(), the passes are sent by passes_signal """
+        t_end = self.t0.tt + self.duration / 86400.
+        passes = []
+        try:
+            for name, satnum, p in generator:
+                start = p[0][0] if p[0][0] is not None else p[0][1]
+                if start is not None and start.tt <= t_end:
+                    passes.append(PassSummary(name, satnum, p[0][0], p[0][1], p[0][3], p[1][1].radians, self.t0))
+        except Exception as err:
+            self.st.log(0, "Pass computation failed: {0}", err)
+        finally:
+            self.passes_signal.emit(passes)
+
+    def passes_computed(self, passes):
+        self.running = False
+        self.compute_btn.setText("Compute")
+        self.compute_btn.setEnabled(True)
+        self.show_passes(passes)
+
+    def show_passes(self, passes):
+        """ Fill the table with a list of PassSummary """
+        self.pass_table.setSortingEnabled(False)  # avoid sorting during the insertion
+        self.pass_table.setRowCount(len(passes))
+        for row, p in enumerate(passes):
+            duration = p.duration()
+            values = [p.name if p.name is not None else str(p.satnum),
+                      int(p.satnum),
+                      p.t_rise.utc_iso() if p.t_rise is not None else p.t0.utc_iso() + " (up)",
+                      round(float(Angle(radians=p.alt_max).degrees), 1),
+                      round(float(duration) / 60., 1) if duration is not None else ""]
+            for col, value in enumerate(values):
+                item = QtWidgets.QTableWidgetItem()
+                item.setData(QtCore.Qt.DisplayRole, value)  # numbers are sorted as numbers
+                self.pass_table.setItem(row, col, item)
+        self.pass_table.setSortingEnabled(True)
+        self.pass_table.sortByColumn(2, QtCore.Qt.AscendingOrder)
+        self.status_lbl.setText("{0} passes".format(len(passes)))
+
+    def update_progress(self, done, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
+    def select_satellite(self, row, column):
+        """ Select the satellite in the main window when a row is double clicked """
+        if not self.ui.select_satellite(self.pass_table.item(row, 0).text()):
+            self.ui.select_satellite(self.pass_table.item(row, 1).data(QtCore.Qt.DisplayRole))
+
+    def show_modal(self):
+        self.setModal(True)
+        self.show()
+
+
 class Tledialog(QtWidgets.QDialog, Ui_Tledialog):
     """ Dialog to set TLE """
     trigger = QtCore.pyqtSignal()